@@ -1,29 +1,43 @@
 import sys
 import os
-import re
-import subprocess
-import tempfile
-import shutil
-import glob
+import time
+
+# Instante de arranque, para medir cuánto tarda en mostrarse la ventana
+STARTUP_START = time.perf_counter()
+
 import logging
 from datetime import datetime
-from collections import defaultdict
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QFileDialog, QTreeWidget, 
                             QTreeWidgetItem, QVBoxLayout, QHBoxLayout, QWidget, 
                             QPushButton, QLineEdit, QLabel, QMessageBox, 
                             QCheckBox, QGroupBox, QFormLayout, QComboBox, QInputDialog,
                             QProgressDialog, QSplitter, QMenu, QAction, QTextEdit,
-                            QDialog, QRadioButton, QButtonGroup, QTabWidget)
-from PyQt5.QtCore import Qt, QSize, QThread, pyqtSignal, QEvent
-from PyQt5.QtGui import QIcon, QFont, QColor, QTextCursor
+                            QDialog, QRadioButton, QButtonGroup, QTabWidget,
+                            QTableView, QAbstractItemView, QListWidget)
+from PyQt5.QtCore import (Qt, QSize, QThread, pyqtSignal, QEvent, QTimer, QSettings, QFile, QLineF,
+                          QAbstractTableModel, QModelIndex, QSortFilterProxyModel)
+from PyQt5.QtGui import QIcon, QFont, QColor, QTextCursor, QPainter, QPen
+
+from asm_core import (AbletonProject, OperationCancelled, DuplicateIndex,
+                      find_content_duplicates, scan_projects, format_size, format_duration,
+                      build_library_index, plan_relink, COLLECT_FOLDER, dispose_files, archive_files,
+                      HAS_NUMPY, PEAK_EXTENSIONS, cached_peaks, load_peaks,
+                      plan_batch, execute_batch, last_batch_journal, rollback_batch)
+
+def open_with_system(path):
+    """Abre un archivo o carpeta con la aplicación predeterminada del sistema"""
+    if sys.platform == 'win32':
+        os.startfile(path)
+    else:
+        # subprocess solo se usa aquí; se importa en el primer uso
+        import subprocess
+        subprocess.call(['open' if sys.platform == 'darwin' else 'xdg-open', path])
 
-# Importar lxml.etree en lugar de xml.etree.ElementTree
-try:
-    from lxml import etree as ET
-except ImportError:
-    # Mostrar mensaje de que se necesita instalar lxml
-    print("Es necesario instalar la biblioteca lxml. Ejecute: pip install lxml")
-    sys.exit(1)
+def move_to_trash(path):
+    """Envía un archivo a la papelera del sistema"""
+    moved, _ = QFile.moveToTrash(path)
+    if not moved:
+        raise OSError(f"No se pudo mover a la papelera: {path}")
 
 # Configurar logger
 def setup_logger():
@@ -35,8 +49,15 @@ def setup_logger():
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
     
-    log_file = os.path.join(log_dir, f"asm_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-    file_handler = logging.FileHandler(log_file)
+    # Un archivo por día en lugar de uno por ejecución
+    log_file = os.path.join(log_dir, f"asm_log_{datetime.now().strftime('%Y%m%d')}.log")
+    
+    # No añadir otro manejador si el logger ya escribe en ese archivo
+    for handler in logger.handlers:
+        if isinstance(handler, logging.FileHandler) and handler.baseFilename == os.path.abspath(log_file):
+            return logger, log_file
+    
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
     file_handler.setLevel(logging.DEBUG)
     
     # Crear formato para los logs
@@ -153,8 +174,613 @@ class MoveToBatchDialog(QDialog):
         else:
             return self.new_folder_input.text(), True
 
+# Diálogo para configurar las carpetas de bibliotecas de samples
+class LibraryRootsDialog(QDialog):
+    def __init__(self, roots, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Bibliotecas de samples")
+        self.setMinimumSize(500, 300)
+        
+        layout = QVBoxLayout()
+        
+        layout.addWidget(QLabel("Carpetas donde buscar los samples faltantes:"))
+        self.roots_list = QListWidget()
+        self.roots_list.addItems(roots)
+        
+        roots_buttons = QHBoxLayout()
+        add_button = QPushButton("Añadir...")
+        add_button.clicked.connect(self.add_root)
+        remove_button = QPushButton("Quitar")
+        remove_button.clicked.connect(self.remove_root)
+        roots_buttons.addWidget(add_button)
+        roots_buttons.addWidget(remove_button)
+        
+        # Botones de aceptar/cancelar
+        button_box = QHBoxLayout()
+        ok_button = QPushButton("Aceptar")
+        ok_button.clicked.connect(self.accept)
+        cancel_button = QPushButton("Cancelar")
+        cancel_button.clicked.connect(self.reject)
+        button_box.addWidget(ok_button)
+        button_box.addWidget(cancel_button)
+        
+        layout.addWidget(self.roots_list)
+        layout.addLayout(roots_buttons)
+        layout.addLayout(button_box)
+        
+        self.setLayout(layout)
+    
+    def add_root(self):
+        folder = QFileDialog.getExistingDirectory(self, "Seleccionar biblioteca de samples")
+        if folder and not self.roots_list.findItems(folder, Qt.MatchExactly):
+            self.roots_list.addItem(folder)
+    
+    def remove_root(self):
+        for item in self.roots_list.selectedItems():
+            self.roots_list.takeItem(self.roots_list.row(item))
+    
+    def get_roots(self):
+        return [self.roots_list.item(i).text() for i in range(self.roots_list.count())]
+
+# Diálogo para revisar la reubicación de los samples faltantes
+class RelinkDialog(QDialog):
+    def __init__(self, plan, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Reubicar samples faltantes")
+        self.change_roots = False
+        self.setMinimumSize(900, 500)
+        
+        layout = QVBoxLayout()
+        
+        found = sum(1 for _, _, chosen in plan if chosen is not None)
+        ambiguous = sum(1 for _, candidates, chosen in plan if chosen is None and candidates)
+        summary = QLabel(f"{len(plan)} archivos faltantes: {found} encontrados, "
+                         f"{ambiguous} con varios candidatos, {len(plan) - found - ambiguous} sin candidatos")
+        
+        # Una fila por archivo faltante; con varios candidatos se elige en un desplegable
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Sample faltante", "Reubicar en"])
+        self.tree.setColumnWidth(0, 350)
+        self.rows = []
+        for sample, candidates, chosen in plan:
+            item = QTreeWidgetItem(self.tree)
+            item.setText(0, sample.relative_path)
+            item.setCheckState(0, Qt.Checked if chosen is not None else Qt.Unchecked)
+            combo = None
+            if len(candidates) > 1:
+                combo = QComboBox()
+                combo.addItem("(elegir candidato)", None)
+                for path, size in candidates:
+                    combo.addItem(f"{path} ({format_size(size)})", (path, size))
+                if chosen is not None:
+                    combo.setCurrentIndex(candidates.index(chosen) + 1)
+                combo.currentIndexChanged.connect(
+                    lambda index, item=item: item.setCheckState(0, Qt.Checked if index > 0 else Qt.Unchecked))
+                self.tree.setItemWidget(item, 1, combo)
+            elif candidates:
+                item.setText(1, candidates[0][0])
+            else:
+                item.setText(1, "(no encontrado)")
+            self.rows.append((item, sample, candidates, chosen, combo))
+        
+        # Botones de aceptar/cancelar
+        button_box = QHBoxLayout()
+        self.ok_button = QPushButton("Reubicar marcados")
+        self.ok_button.clicked.connect(self.accept)
+        self.cancel_button = QPushButton("Cancelar")
+        self.cancel_button.clicked.connect(self.reject)
+        roots_button = QPushButton("Cambiar bibliotecas...")
+        roots_button.clicked.connect(self.request_roots_change)
+        button_box.addWidget(roots_button)
+        button_box.addStretch(1)
+        button_box.addWidget(self.ok_button)
+        button_box.addWidget(self.cancel_button)
+        
+        layout.addWidget(summary)
+        layout.addWidget(self.tree)
+        layout.addLayout(button_box)
+        
+        self.setLayout(layout)
+    
+    def request_roots_change(self):
+        self.change_roots = True
+        self.reject()
+    
+    def get_relinks(self):
+        """Devuelve (sample, ruta, tamaño) de las filas marcadas con un archivo elegido"""
+        relinks = []
+        for item, sample, candidates, chosen, combo in self.rows:
+            if item.checkState(0) != Qt.Checked:
+                continue
+            if combo is not None:
+                chosen = combo.currentData()
+            elif candidates:
+                chosen = candidates[0]
+            if chosen is not None:
+                relinks.append((sample,) + tuple(chosen))
+        return relinks
+
+# Hilo para cargar proyectos sin bloquear la interfaz
+class ProjectLoaderThread(QThread):
+    progress = pyqtSignal(int, str)  # Porcentaje y descripción de la etapa
+    partial_result = pyqtSignal(str, object)  # Resultado de cada etapa a medida que termina
+    load_finished = pyqtSignal(object)  # AbletonProject cargado
+    load_failed = pyqtSignal(str)
+    load_cancelled = pyqtSignal()
+    
+    # Número de samples que se envían en cada resultado parcial
+    SAMPLES_BATCH = 500
+    
+    def __init__(self, als_path, light_scan=False, parent=None):
+        super().__init__(parent)
+        self.project = AbletonProject(als_path)
+        self.light_scan = light_scan
+    
+    def check_cancel(self):
+        """Interrumpe la carga si se ha solicitado la cancelación"""
+        if self.isInterruptionRequested():
+            raise OperationCancelled()
+    
+    def report_progress(self, value, message):
+        """Reenvía la etapa de AbletonProject.load y la carpeta en cuanto está escaneada"""
+        self.progress.emit(value, message)
+        if self.project.folder_structure:
+            self.partial_result.emit('physical_files', self.project.physical_files)
+            self.partial_result.emit('folder_structure', self.project.folder_structure)
+    
+    def run(self):
+        try:
+            self.project.load(self.light_scan, self.check_cancel, self.report_progress)
+            
+            # Enviar los samples por lotes para que la interfaz avance progresivamente
+            samples = self.project.samples
+            for start in range(0, len(samples), self.SAMPLES_BATCH):
+                self.check_cancel()
+                self.partial_result.emit('samples', samples[start:start + self.SAMPLES_BATCH])
+            
+            self.progress.emit(80, "Actualizando interfaz...")
+            self.load_finished.emit(self.project)
+        except OperationCancelled:
+            self.load_cancelled.emit()
+        except Exception as e:
+            self.load_failed.emit(str(e))
+
+# Hilo genérico para operaciones largas
+class TaskThread(QThread):
+    progress = pyqtSignal(int, int)  # Elementos procesados y total
+    task_finished = pyqtSignal(object)
+    task_failed = pyqtSignal(str)
+    task_cancelled = pyqtSignal()
+    
+    def __init__(self, function, *args, parent=None, **kwargs):
+        """La función recibe además check_cancel y progress_callback"""
+        super().__init__(parent)
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+    
+    def check_cancel(self):
+        """Interrumpe la tarea si se ha solicitado la cancelación"""
+        if self.isInterruptionRequested():
+            raise OperationCancelled()
+    
+    def run(self):
+        try:
+            result = self.function(*self.args, check_cancel=self.check_cancel,
+                                   progress_callback=self.progress.emit, **self.kwargs)
+            self.task_finished.emit(result)
+        except OperationCancelled:
+            self.task_cancelled.emit()
+        except Exception as e:
+            self.task_failed.emit(str(e))
+
+# Diálogo con los grupos de archivos de contenido idéntico
+class ContentDuplicatesDialog(QDialog):
+    def __init__(self, duplicates, base_folder, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Duplicados por contenido")
+        self.setMinimumSize(800, 500)
+        
+        layout = QVBoxLayout()
+        
+        reclaimable = sum(group[0].size * (len(group) - 1) for _, group in duplicates)
+        summary = QLabel(f"{len(duplicates)} grupos de archivos idénticos, "
+                         f"{format_size(reclaimable)} recuperables")
+        
+        tree = QTreeWidget()
+        tree.setHeaderLabels(["Archivo", "Tamaño"])
+        tree.setColumnWidth(0, 600)
+        for digest, group in duplicates:
+            group_item = QTreeWidgetItem(tree)
+            group_item.setText(0, f"{len(group)} copias · {digest[:12]}")
+            group_item.setText(1, format_size(group[0].size))
+            for f in group:
+                file_item = QTreeWidgetItem(group_item)
+                file_item.setText(0, os.path.relpath(f.path, base_folder))
+                file_item.setData(0, Qt.UserRole, f.path)
+            group_item.setExpanded(True)
+        
+        close_button = QPushButton("Cerrar")
+        close_button.clicked.connect(self.accept)
+        
+        layout.addWidget(summary)
+        layout.addWidget(tree)
+        layout.addWidget(close_button)
+        
+        self.setLayout(layout)
+
+# Diálogo con el audio sin usar, agrupado por carpeta, para retirarlo en bloque
+class UnusedAudioDialog(QDialog):
+    TRASH = 1
+    ARCHIVE = 2
+    
+    def __init__(self, report, base_folder, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Audio sin usar")
+        self.setMinimumSize(800, 500)
+        self.action = None
+        
+        layout = QVBoxLayout()
+        
+        summary = QLabel(f"{len(report.files)} archivos sin usar en {len(report.by_folder)} carpetas, "
+                         f"{format_size(report.total_size)} recuperables "
+                         f"(según {len(report.projects)} proyectos y {len(report.presets)} presets de la carpeta)")
+        
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Archivo", "Tamaño"])
+        self.tree.setColumnWidth(0, 600)
+        for folder, count, size in report.folder_sizes():
+            folder_item = QTreeWidgetItem(self.tree)
+            folder_item.setText(0, f"{folder or '/'} ({count} archivos)")
+            folder_item.setText(1, format_size(size))
+            folder_item.setFlags(folder_item.flags() | Qt.ItemIsAutoTristate)
+            for f in report.by_folder[folder]:
+                file_item = QTreeWidgetItem(folder_item)
+                file_item.setText(0, f.name)
+                file_item.setText(1, format_size(f.size))
+                file_item.setData(0, Qt.UserRole, f.path)
+                file_item.setCheckState(0, Qt.Checked)
+        
+        # Botones de acciones
+        button_box = QHBoxLayout()
+        trash_button = QPushButton("Mover a la papelera")
+        trash_button.clicked.connect(lambda: self.choose(self.TRASH))
+        archive_button = QPushButton("Archivar en carpeta...")
+        archive_button.clicked.connect(lambda: self.choose(self.ARCHIVE))
+        close_button = QPushButton("Cerrar")
+        close_button.clicked.connect(self.reject)
+        button_box.addWidget(trash_button)
+        button_box.addWidget(archive_button)
+        button_box.addStretch(1)
+        button_box.addWidget(close_button)
+        
+        layout.addWidget(summary)
+        layout.addWidget(self.tree)
+        layout.addLayout(button_box)
+        
+        self.setLayout(layout)
+    
+    def choose(self, action):
+        if not self.get_selected_paths():
+            QMessageBox.warning(self, "Audio sin usar", "No hay archivos marcados.")
+            return
+        self.action = action
+        self.accept()
+    
+    def get_selected_paths(self):
+        """Devuelve las rutas de los archivos marcados"""
+        paths = []
+        for i in range(self.tree.topLevelItemCount()):
+            folder_item = self.tree.topLevelItem(i)
+            for j in range(folder_item.childCount()):
+                file_item = folder_item.child(j)
+                if file_item.checkState(0) == Qt.Checked:
+                    paths.append(file_item.data(0, Qt.UserRole))
+        return paths
+
+# Vista previa de un lote de renombrados o movimientos antes de ejecutarlo
+class BatchPreviewDialog(QDialog):
+    def __init__(self, title, plan, base_folder, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setMinimumSize(900, 500)
+        
+        prefix = os.path.join(base_folder, "") if base_folder else None
+        
+        def relative(path):
+            # Rutas relativas a la carpeta del lote; las de fuera, completas
+            return path[len(prefix):] if prefix and path.startswith(prefix) else path
+        
+        layout = QVBoxLayout()
+        
+        text = f"{len(plan.moves)} archivos se procesarán"
+        if plan.conflicts:
+            text += f", {len(plan.conflicts)} tienen conflictos y se omitirán"
+        if plan.directories:
+            text += f", se crearán {len(plan.directories)} carpetas"
+        summary = QLabel(text)
+        
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Origen", "Destino", "Estado"])
+        self.tree.setColumnWidth(0, 350)
+        self.tree.setColumnWidth(1, 350)
+        self.tree.setRootIsDecorated(False)
+        # Primero los conflictos, para que se vean sin desplazar la lista
+        for src, dst, reason in plan.conflicts:
+            item = QTreeWidgetItem(self.tree, [relative(src), relative(dst), reason])
+            for column in range(3):
+                item.setForeground(column, QColor(255, 0, 0))
+        for src, dst in plan.moves:
+            QTreeWidgetItem(self.tree, [relative(src), relative(dst), "OK"])
+        
+        # Botones de acciones
+        button_box = QHBoxLayout()
+        run_button = QPushButton("Ejecutar")
+        run_button.setEnabled(bool(plan.moves))
+        run_button.clicked.connect(self.accept)
+        cancel_button = QPushButton("Cancelar")
+        cancel_button.clicked.connect(self.reject)
+        button_box.addStretch(1)
+        button_box.addWidget(run_button)
+        button_box.addWidget(cancel_button)
+        
+        layout.addWidget(summary)
+        layout.addWidget(self.tree)
+        layout.addLayout(button_box)
+        
+        self.setLayout(layout)
+
+# Dibujo de la forma de onda a partir de un resumen de picos
+class WaveformWidget(QWidget):
+    def __init__(self, peaks, parent=None):
+        super().__init__(parent)
+        self.peaks = peaks
+        self.setMinimumSize(600, 160)
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(30, 30, 30))
+        width = self.width()
+        middle = self.height() / 2
+        painter.setPen(QPen(QColor(90, 90, 90)))
+        painter.drawLine(QLineF(0, middle, width, middle))
+        
+        _, mins, maxs = self.peaks.level_for(width)
+        if not len(mins):
+            return
+        # Agrupar los puntos del nivel en tantas columnas como píxeles
+        import numpy as np
+        columns = min(width, len(mins))
+        starts = np.unique(np.arange(columns) * len(mins) // columns)
+        mins = np.minimum.reduceat(mins, starts)
+        maxs = np.maximum.reduceat(maxs, starts)
+        scale = middle / 32768
+        step = width / len(starts)
+        painter.setPen(QPen(QColor(80, 200, 120)))
+        painter.drawLines([QLineF(x * step, middle - high * scale, x * step, middle - low * scale)
+                           for x, (low, high) in enumerate(zip(mins.tolist(), maxs.tolist()))])
+
+# Vista previa de un archivo de audio
+class WaveformDialog(QDialog):
+    def __init__(self, path, peaks, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.setWindowTitle(os.path.basename(path))
+        self.resize(900, 260)
+        
+        layout = QVBoxLayout()
+        
+        info = QLabel(f"{format_duration(peaks.duration)} · {peaks.sample_rate / 1000:g} kHz · "
+                      f"{peaks.channels} canales · {format_size(os.path.getsize(path))}")
+        
+        button_box = QHBoxLayout()
+        open_button = QPushButton("Abrir con la aplicación del sistema")
+        open_button.clicked.connect(self.open_externally)
+        close_button = QPushButton("Cerrar")
+        close_button.clicked.connect(self.accept)
+        button_box.addWidget(open_button)
+        button_box.addStretch(1)
+        button_box.addWidget(close_button)
+        
+        layout.addWidget(info)
+        layout.addWidget(WaveformWidget(peaks))
+        layout.addLayout(button_box)
+        
+        self.setLayout(layout)
+    
+    def open_externally(self):
+        try:
+            open_with_system(self.path)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error al abrir archivo: {str(e)}")
+
+# Modelo de tabla virtual sobre la lista de samples
+class SamplesTableModel(QAbstractTableModel):
+    HEADERS = ["Nombre", "Ruta relativa", "Ruta absoluta", "Tamaño", "Estado", "Carpeta",
+               "Formato", "Duración", "Frecuencia", "Canales", "Bits"]
+    # Columnas con metadatos de audio y el atributo de AudioInfo que muestran
+    AUDIO_COLUMNS = {6: 'format', 7: 'duration', 8: 'sample_rate', 9: 'channels', 10: 'bit_depth'}
+    
+    # Rol con el registro del sample y rol con el valor usado para ordenar
+    SampleRole = Qt.UserRole
+    SortRole = Qt.UserRole + 1
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.samples = []
+        self.lower_names = []  # Nombres en minúsculas, en el mismo orden que samples
+        self.duplicate_index = DuplicateIndex()
+        self.highlight_duplicates = False
+    
+    def set_samples(self, samples, duplicate_index=None):
+        """Sustituye la lista de samples del modelo y su índice de duplicados"""
+        self.beginResetModel()
+        self.samples = samples
+        self.duplicate_index = duplicate_index if duplicate_index is not None else DuplicateIndex(samples)
+        self.refresh_names()
+        self.endResetModel()
+    
+    def samples_changed(self):
+        """Notifica a las vistas que los datos de los samples han cambiado"""
+        self.refresh_names()
+        if self.samples:
+            self.dataChanged.emit(self.index(0, 0),
+                                  self.index(len(self.samples) - 1, len(self.HEADERS) - 1))
+    
+    def refresh_names(self):
+        """Recalcula la columna de nombres en minúsculas"""
+        self.lower_names = [sample.name.lower() for sample in self.samples]
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.samples)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+            
+        sample = self.samples[index.row()]
+        column = index.column()
+        
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return sample.name
+            elif column == 1:
+                return sample.relative_path
+            elif column == 2:
+                return sample.absolute_path
+            elif column == 3:
+                return format_size(sample.size)
+            elif column == 4:
+                # Estado (Verde si existe, Rojo si falta)
+                return "Encontrado" if sample.exists else "Faltante"
+            elif column == 5:
+                return sample.folder
+            elif column in self.AUDIO_COLUMNS:
+                return self.audio_text(sample.audio_info, column)
+        elif role == Qt.ForegroundRole and column == 4:
+            return QColor(0, 128, 0) if sample.exists else QColor(255, 0, 0)
+        elif role == Qt.BackgroundRole and column == 0:
+            # Destacar duplicados
+            if self.highlight_duplicates and self.duplicate_index.is_duplicate(self.lower_names[index.row()]):
+                return QColor(255, 255, 0, 50)  # Amarillo claro
+        elif role == self.SampleRole:
+            return sample
+        elif role == self.SortRole:
+            if column == 3:
+                return sample.size
+            elif column == 4:
+                return int(sample.exists)
+            elif column in self.AUDIO_COLUMNS and column != 6:
+                # Sin metadatos al principio al ordenar de menor a mayor
+                value = getattr(sample.audio_info, self.AUDIO_COLUMNS[column], None)
+                return -1 if value is None else value
+            return self.data(index, Qt.DisplayRole).lower()
+        return None
+    
+    def audio_text(self, audio_info, column):
+        """Texto de una columna de metadatos de audio"""
+        value = getattr(audio_info, self.AUDIO_COLUMNS[column], None)
+        if value is None:
+            return ""
+        if column == 7:
+            return format_duration(value)
+        elif column == 8:
+            return f"{value / 1000:g} kHz"
+        elif column == 9:
+            return {1: "Mono", 2: "Estéreo"}.get(value, str(value))
+        return str(value)
+
+# Filtros de búsqueda, duplicados, faltantes y carpeta sobre el modelo de samples
+class SamplesFilterProxyModel(QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.search_text = ""
+        self.show_duplicates = False
+        self.show_missing = False
+        self.folder_filter = None  # Ruta relativa de carpeta o None
+        self.format_filter = None  # Formato de audio o None
+        self.search_rows = None  # Filas del modelo que coinciden con search_text
+        self.setSortRole(SamplesTableModel.SortRole)
+    
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.modelReset.connect(self.reset_search)
+    
+    def set_filters(self, search_text="", show_duplicates=False, show_missing=False, folder_filter=None,
+                    format_filter=None):
+        """Aplica los criterios de filtro y vuelve a evaluar las filas"""
+        search_text = search_text.lower()
+        if search_text != self.search_text or self.search_rows is None:
+            self.update_search_rows(search_text)
+        self.show_duplicates = show_duplicates
+        self.show_missing = show_missing
+        self.folder_filter = folder_filter
+        self.format_filter = format_filter
+        self.invalidateFilter()
+    
+    def update_search_rows(self, search_text):
+        """Calcula las filas que coinciden con la búsqueda
+
+        Si la búsqueda amplía la anterior, solo se revisan las filas que ya
+        coincidían en lugar de todos los samples.
+        """
+        lower_names = self.sourceModel().lower_names
+        if not search_text:
+            self.search_rows = None
+        else:
+            if self.search_rows is not None and self.search_text and search_text.startswith(self.search_text):
+                candidates = self.search_rows
+            else:
+                candidates = range(len(lower_names))
+            self.search_rows = {row for row in candidates if search_text in lower_names[row]}
+        self.search_text = search_text
+    
+    def reset_search(self):
+        """Descarta las coincidencias guardadas tras cambiar los datos del modelo"""
+        self.search_rows = None
+        self.update_search_rows(self.search_text)
+    
+    def filterAcceptsRow(self, source_row, source_parent):
+        model = self.sourceModel()
+        sample = model.samples[source_row]
+        
+        if self.search_rows is not None and source_row not in self.search_rows:
+            return False
+            
+        if self.show_duplicates and not model.duplicate_index.is_duplicate(model.lower_names[source_row]):
+            return False
+            
+        if self.show_missing and sample.exists:
+            return False
+        
+        if self.format_filter is not None and (sample.audio_info is None
+                                               or sample.audio_info.format != self.format_filter):
+            return False
+        
+        if self.folder_filter is not None:
+            # Comprobar si el sample está en esta carpeta o subcarpeta
+            sample_folder = sample.folder
+            if sample_folder != self.folder_filter and not sample_folder.startswith(self.folder_filter + "/"):
+                return False
+        
+        return True
+
+# Máximo de samples mostrados en una búsqueda de la biblioteca
+LIBRARY_RESULTS_LIMIT = 500
+
 # Clase principal
 class AbletonSampleManager(QMainWindow):
+    # Espera tras la última pulsación antes de filtrar los samples
+    SEARCH_DEBOUNCE_MS = 250
+    
     def __init__(self):
         super().__init__()
         # Configurar logger
@@ -165,11 +791,12 @@ class AbletonSampleManager(QMainWindow):
         self.setMinimumSize(1200, 800)
         self.current_project = None
         self.project_folder = None
-        self.samples = []
-        self.xml_tree = None  # Guardar referencia al árbol XML
-        self.xml_root = None  # Guardar referencia a la raíz XML
-        self.physical_files = []  # Lista de archivos físicos encontrados
-        self.folder_structure = {}  # Estructura de carpetas
+        self.project = AbletonProject()  # Samples, archivos físicos e índices del proyecto
+        self.loader_thread = None  # Hilo de carga en curso
+        self.tasks = set()  # Tareas en segundo plano en curso
+        self.library_index = None  # Índice de samples de la biblioteca de proyectos
+        self.relink_index = None  # Índice por nombre de las bibliotecas de samples
+        self.settings = QSettings("AbletonSampleManager", "AbletonSampleManager")
         
         self.init_ui()
         self.logger.info("Interfaz principal inicializada")
@@ -222,18 +849,24 @@ class AbletonSampleManager(QMainWindow):
         project_tab = QWidget()
         self.init_project_tab(project_tab)
         
-        # Tab 2: Explorador de archivos
+        # Tabs 2-4: Explorador, operaciones por lotes y biblioteca de proyectos.
+        # Se construyen la primera vez que se activan para que la ventana
+        # aparezca antes
         explorer_tab = QWidget()
-        self.init_explorer_tab(explorer_tab)
-        
-        # Tab 3: Operaciones por lotes
         batch_tab = QWidget()
-        self.init_batch_tab(batch_tab)
+        self.library_tab = QWidget()
+        self.lazy_tabs = {
+            explorer_tab: self.init_explorer_tab,
+            batch_tab: self.init_batch_tab,
+            self.library_tab: self.init_library_tab,
+        }
         
         # Añadir pestañas
         self.tabs.addTab(project_tab, "Proyecto Ableton")
         self.tabs.addTab(explorer_tab, "Explorador")
         self.tabs.addTab(batch_tab, "Operaciones por lotes")
+        self.tabs.addTab(self.library_tab, "Biblioteca de proyectos")
+        self.tabs.currentChanged.connect(self.build_lazy_tab)
         
         right_layout.addWidget(self.tabs)
         
@@ -270,6 +903,17 @@ class AbletonSampleManager(QMainWindow):
         self.refresh_folder_button.setEnabled(False)
         self.create_folder_button.setEnabled(False)
     
+    def build_lazy_tab(self, index):
+        """Construye una pestaña la primera vez que se muestra"""
+        tab = self.tabs.widget(index)
+        init_tab = self.lazy_tabs.pop(tab, None)
+        if init_tab is not None:
+            init_tab(tab)
+    
+    def log_startup_time(self):
+        """Registra el tiempo desde el arranque hasta que se muestra la ventana"""
+        self.log_status(f"Ventana mostrada en {time.perf_counter() - STARTUP_START:.2f} s", logging.DEBUG)
+    
     def init_project_tab(self, tab):
         layout = QVBoxLayout(tab)
         
@@ -284,7 +928,12 @@ class AbletonSampleManager(QMainWindow):
         browse_button = QPushButton("Explorar...")
         browse_button.clicked.connect(self.browse_als_file)
         
+        self.light_scan_check = QCheckBox("Escaneo ligero")
+        self.light_scan_check.setToolTip("Extrae las referencias sin cargar el árbol XML completo.\n"
+                                         "El árbol solo se carga si se edita el proyecto.")
+        
         project_layout.addWidget(self.project_path)
+        project_layout.addWidget(self.light_scan_check)
         project_layout.addWidget(browse_button)
         project_group.setLayout(project_layout)
         
@@ -312,7 +961,13 @@ class AbletonSampleManager(QMainWindow):
         
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Buscar samples por nombre...")
-        self.search_input.textChanged.connect(self.filter_samples)
+        
+        # Filtrar cuando se deja de escribir, no en cada pulsación
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.filter_samples)
+        self.search_input.textChanged.connect(self.search_timer.start)
         
         search_button = QPushButton("Buscar")
         search_button.clicked.connect(self.filter_samples)
@@ -323,9 +978,15 @@ class AbletonSampleManager(QMainWindow):
         self.missing_check = QCheckBox("Mostrar faltantes")
         self.missing_check.stateChanged.connect(self.filter_samples)
         
+        # Se rellena con los formatos encontrados al leer los metadatos
+        self.format_combo = QComboBox()
+        self.format_combo.addItem("Todos los formatos", None)
+        self.format_combo.currentIndexChanged.connect(self.filter_samples)
+        
         search_layout.addWidget(self.search_input)
         search_layout.addWidget(self.duplicate_check)
         search_layout.addWidget(self.missing_check)
+        search_layout.addWidget(self.format_combo)
         search_layout.addWidget(search_button)
         search_group.setLayout(search_layout)
         
@@ -333,19 +994,35 @@ class AbletonSampleManager(QMainWindow):
         samples_group = QGroupBox("Samples encontrados")
         samples_layout = QVBoxLayout()
         
-        self.samples_tree = QTreeWidget()
-        self.samples_tree.setHeaderLabels(["Nombre", "Ruta relativa", "Ruta absoluta", "Tamaño", "Estado", "Carpeta"])
-        self.samples_tree.setColumnWidth(0, 200)
-        self.samples_tree.setColumnWidth(1, 250)
-        self.samples_tree.setColumnWidth(2, 300)
-        self.samples_tree.setColumnWidth(3, 80)
-        self.samples_tree.setColumnWidth(4, 80)
-        self.samples_tree.setColumnWidth(5, 150)
-        self.samples_tree.setSelectionMode(QTreeWidget.ExtendedSelection)
-        self.samples_tree.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.samples_tree.customContextMenuRequested.connect(self.show_samples_context_menu)
-        
-        samples_layout.addWidget(self.samples_tree)
+        # Modelo virtual: la vista solo pide los datos de las filas visibles
+        self.samples_model = SamplesTableModel(self)
+        self.samples_proxy = SamplesFilterProxyModel(self)
+        self.samples_proxy.setSourceModel(self.samples_model)
+        
+        self.samples_view = QTableView()
+        self.samples_view.setModel(self.samples_proxy)
+        self.samples_view.setColumnWidth(0, 200)
+        self.samples_view.setColumnWidth(1, 250)
+        self.samples_view.setColumnWidth(2, 300)
+        self.samples_view.setColumnWidth(3, 80)
+        self.samples_view.setColumnWidth(4, 80)
+        self.samples_view.setColumnWidth(5, 150)
+        for column in SamplesTableModel.AUDIO_COLUMNS:
+            self.samples_view.setColumnWidth(column, 70)
+        self.samples_view.horizontalHeader().setStretchLastSection(True)
+        self.samples_view.verticalHeader().setVisible(False)
+        self.samples_view.verticalHeader().setDefaultSectionSize(self.samples_view.fontMetrics().height() + 6)
+        self.samples_view.setShowGrid(False)
+        self.samples_view.setWordWrap(False)
+        self.samples_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.samples_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        # Sin columna de orden inicial para conservar el orden del proyecto
+        self.samples_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.samples_view.setSortingEnabled(True)
+        self.samples_view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.samples_view.customContextMenuRequested.connect(self.show_samples_context_menu)
+        
+        samples_layout.addWidget(self.samples_view)
         samples_group.setLayout(samples_layout)
         
         # Área de acciones
@@ -364,6 +1041,18 @@ class AbletonSampleManager(QMainWindow):
         self.mark_duplicates_button = QPushButton("Marcar duplicados")
         self.mark_duplicates_button.clicked.connect(self.mark_duplicates)
         
+        self.content_duplicates_button = QPushButton("Duplicados por contenido")
+        self.content_duplicates_button.clicked.connect(self.find_content_duplicates)
+        
+        self.relink_button = QPushButton("Reubicar faltantes")
+        self.relink_button.clicked.connect(self.relink_missing_samples)
+        
+        self.collect_button = QPushButton("Recopilar y guardar")
+        self.collect_button.clicked.connect(self.collect_and_save)
+        
+        self.unused_button = QPushButton("Audio sin usar")
+        self.unused_button.clicked.connect(self.find_unused_audio)
+        
         self.save_changes_button = QPushButton("Guardar cambios")
         self.save_changes_button.clicked.connect(self.save_changes)
         
@@ -375,6 +1064,10 @@ class AbletonSampleManager(QMainWindow):
         self.add_suffix_button.setEnabled(False)
         self.replace_button.setEnabled(False)
         self.mark_duplicates_button.setEnabled(False)
+        self.content_duplicates_button.setEnabled(False)
+        self.relink_button.setEnabled(False)
+        self.collect_button.setEnabled(False)
+        self.unused_button.setEnabled(False)
         self.save_changes_button.setEnabled(False)
         self.rescan_button.setEnabled(False)
         
@@ -382,6 +1075,10 @@ class AbletonSampleManager(QMainWindow):
         actions_layout.addWidget(self.add_suffix_button)
         actions_layout.addWidget(self.replace_button)
         actions_layout.addWidget(self.mark_duplicates_button)
+        actions_layout.addWidget(self.content_duplicates_button)
+        actions_layout.addWidget(self.relink_button)
+        actions_layout.addWidget(self.collect_button)
+        actions_layout.addWidget(self.unused_button)
         actions_layout.addWidget(self.save_changes_button)
         actions_layout.addWidget(self.rescan_button)
         actions_group.setLayout(actions_layout)
@@ -459,6 +1156,55 @@ class AbletonSampleManager(QMainWindow):
         layout.addWidget(filter_group)
         layout.addWidget(explorer_group)
     
+    def init_library_tab(self, tab):
+        layout = QVBoxLayout(tab)
+        
+        # Grupo para la carpeta raíz de proyectos
+        root_group = QGroupBox("Carpeta raíz de proyectos")
+        root_layout = QHBoxLayout()
+        
+        self.library_root = QLineEdit()
+        self.library_root.setReadOnly(True)
+        
+        browse_root_button = QPushButton("Examinar...")
+        browse_root_button.clicked.connect(self.browse_library_root)
+        
+        self.scan_library_button = QPushButton("Indexar proyectos")
+        self.scan_library_button.clicked.connect(self.scan_library)
+        self.scan_library_button.setEnabled(False)
+        
+        root_layout.addWidget(self.library_root)
+        root_layout.addWidget(browse_root_button)
+        root_layout.addWidget(self.scan_library_button)
+        root_group.setLayout(root_layout)
+        
+        # Grupo para consultar el uso de samples
+        usage_group = QGroupBox("Uso de samples")
+        usage_layout = QVBoxLayout()
+        
+        self.library_summary = QLabel("Sin indexar")
+        
+        self.library_search = QLineEdit()
+        self.library_search.setPlaceholderText("Buscar sample por nombre o ruta...")
+        
+        self.library_search_timer = QTimer(self)
+        self.library_search_timer.setSingleShot(True)
+        self.library_search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.library_search_timer.timeout.connect(self.update_library_results)
+        self.library_search.textChanged.connect(self.library_search_timer.start)
+        
+        self.library_tree = QTreeWidget()
+        self.library_tree.setHeaderLabels(["Sample / Proyecto", "Proyectos"])
+        self.library_tree.setColumnWidth(0, 700)
+        
+        usage_layout.addWidget(self.library_summary)
+        usage_layout.addWidget(self.library_search)
+        usage_layout.addWidget(self.library_tree)
+        usage_group.setLayout(usage_layout)
+        
+        layout.addWidget(root_group)
+        layout.addWidget(usage_group)
+    
     def init_batch_tab(self, tab):
         layout = QVBoxLayout(tab)
         
@@ -543,6 +1289,11 @@ class AbletonSampleManager(QMainWindow):
         actions_layout.addWidget(self.batch_replace_button)
         actions_layout.addWidget(self.batch_move_button)
         actions_layout.addWidget(self.batch_create_folder_button)
+        
+        self.batch_undo_button = QPushButton("Deshacer último lote")
+        self.batch_undo_button.clicked.connect(self.undo_last_batch)
+        self.batch_undo_button.setEnabled(last_batch_journal() is not None)
+        actions_layout.addWidget(self.batch_undo_button)
         actions_group.setLayout(actions_layout)
         
         # Deshabilitar botones hasta que se cargue una carpeta
@@ -594,248 +1345,214 @@ class AbletonSampleManager(QMainWindow):
     def load_project(self):
         if not self.current_project:
             return
-            
-        try:
-            # Mostrar diálogo de progreso
-            progress = QProgressDialog("Cargando proyecto Ableton Live...", "Cancelar", 0, 100, self)
-            progress.setWindowTitle("Cargando proyecto")
-            progress.setWindowModality(Qt.WindowModal)
-            progress.setValue(0)
-            progress.show()
-            
-            self.log_status("Iniciando carga del proyecto...", logging.INFO)
-            
-            # Crear un archivo temporal para el XML descomprimido
-            self.temp_dir = tempfile.mkdtemp()
-            self.temp_xml = os.path.join(self.temp_dir, "temp_project.xml")
-            
-            # Descomprimir el archivo .als usando gzip
-            progress.setValue(10)
-            progress.setLabelText("Descomprimiendo archivo .als...")
-            self.log_status("Descomprimiendo archivo .als...", logging.INFO)
-            subprocess.run(['gzip', '-cd', self.current_project], stdout=open(self.temp_xml, 'wb'))
-            
-            # Analizar el XML
-            progress.setValue(20)
-            progress.setLabelText("Analizando estructura del proyecto...")
-            self.log_status("Analizando estructura del proyecto...", logging.INFO)
-            parser = ET.XMLParser(remove_blank_text=True)
-            self.xml_tree = ET.parse(self.temp_xml, parser)
-            self.xml_root = self.xml_tree.getroot()
-            
-            # Escanear la carpeta del proyecto para encontrar archivos físicos
-            progress.setValue(30)
-            progress.setLabelText("Escaneando carpeta del proyecto...")
-            self.log_status("Escaneando carpeta del proyecto...", logging.INFO)
-            self.scan_physical_files()
-            
-            # Analizar la estructura de carpetas
-            progress.setValue(40)
-            progress.setLabelText("Escaneando estructura de carpetas...")
-            self.log_status("Escaneando estructura de carpetas...", logging.INFO)
-            self.analyze_folder_structure()
-            
-            # Buscar samples en el proyecto
-            progress.setValue(50)
-            progress.setLabelText("Buscando samples en el proyecto...")
-            self.log_status("Buscando samples en el proyecto...", logging.INFO)
-            self.find_samples_in_project()
-            
-            # Actualizar la UI
-            progress.setValue(80)
-            progress.setLabelText("Actualizando interfaz...")
-            self.log_status("Actualizando interfaz...", logging.INFO)
-            self.update_samples_tree()
-            self.update_folder_tree()
-            
-            # Habilitar botones ahora que hay un proyecto cargado
-            self.add_prefix_button.setEnabled(True)
-            self.add_suffix_button.setEnabled(True)
-            self.replace_button.setEnabled(True)
-            self.mark_duplicates_button.setEnabled(True)
-            self.save_changes_button.setEnabled(True)
-            self.rescan_button.setEnabled(True)
-            self.refresh_folder_button.setEnabled(True)
-            self.create_folder_button.setEnabled(True)
-            
-            # Completar diálogo de progreso
-            progress.setValue(100)
-            self.log_status("Proyecto cargado correctamente", logging.INFO)
-            
-        except Exception as e:
-            self.log_status(f"Error al cargar proyecto: {str(e)}", logging.ERROR)
-            QMessageBox.critical(self, "Error", f"Error al cargar el proyecto: {str(e)}")
-            # Limpiar archivos temporales en caso de error
-            if hasattr(self, 'temp_dir') and os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir)
-    
-    def scan_physical_files(self):
-        """Escanea los archivos físicos en la carpeta del proyecto"""
-        if not self.project_folder:
+        
+        # Ignorar si ya hay una carga en curso
+        if self.loader_thread is not None and self.loader_thread.isRunning():
             return
             
-        self.physical_files = []
-        for root, dirs, files in os.walk(self.project_folder):
-            for file in files:
-                if file.lower().endswith(('.wav', '.mp3', '.aiff', '.aif', '.m4a', '.ogg', '.flac')):
-                    full_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(full_path, self.project_folder)
-                    size = os.path.getsize(full_path)
-                    self.physical_files.append({
-                        'name': file,
-                        'path': full_path,
-                        'rel_path': rel_path,
-                        'size': size
-                    })
-        
-        self.physical_files_count_label.setText(str(len(self.physical_files)))
-        self.log_status(f"Archivos físicos encontrados: {len(self.physical_files)}")
-    
-    def analyze_folder_structure(self):
-        """Analiza la estructura de carpetas del proyecto"""
+        # Mostrar diálogo de progreso
+        self.load_progress = QProgressDialog("Cargando proyecto Ableton Live...", "Cancelar", 0, 100, self)
+        self.load_progress.setWindowTitle("Cargando proyecto")
+        self.load_progress.setWindowModality(Qt.WindowModal)
+        self.load_progress.setAutoClose(False)
+        self.load_progress.setAutoReset(False)
+        self.load_progress.setValue(0)
+        self.load_progress.canceled.connect(self.cancel_load)
+        self.load_progress.show()
+        
+        self.log_status("Iniciando carga del proyecto...", logging.INFO)
+        self.load_start = time.perf_counter()
+        
+        # Limpiar el estado del proyecto anterior; sus acciones no valen para el nuevo hasta que termine
+        self.project = AbletonProject(self.current_project)
+        self.samples_model.set_samples([])
+        self.folder_tree.clear()
+        self.set_project_actions_enabled(False)
+        
+        # Cargar en segundo plano
+        self.loader_thread = ProjectLoaderThread(self.current_project, self.light_scan_check.isChecked(), self)
+        self.loader_thread.progress.connect(self.on_load_progress)
+        self.loader_thread.partial_result.connect(self.on_load_partial_result)
+        self.loader_thread.load_finished.connect(self.on_load_finished)
+        self.loader_thread.load_failed.connect(self.on_load_failed)
+        self.loader_thread.load_cancelled.connect(self.on_load_cancelled)
+        self.loader_thread.start()
+    
+    def cancel_load(self):
+        """Solicita la cancelación de la carga en curso"""
+        if self.loader_thread is not None and self.loader_thread.isRunning():
+            self.loader_thread.requestInterruption()
+            self.log_status("Cancelando carga del proyecto...", logging.INFO)
+    
+    def close_load_progress(self):
+        """Cierra el diálogo de progreso sin que el cierre cuente como cancelación"""
+        self.load_progress.canceled.disconnect(self.cancel_load)
+        self.load_progress.close()
+    
+    def on_load_progress(self, value, message):
+        """Actualiza el diálogo de progreso con la etapa actual de la carga"""
+        self.load_progress.setValue(value)
+        self.load_progress.setLabelText(message)
+        self.log_status(message, logging.INFO)
+    
+    def on_load_partial_result(self, kind, data):
+        """Incorpora a la interfaz el resultado de una etapa de la carga"""
+        if kind == 'physical_files':
+            self.project.physical_files = data
+            self.physical_files_count_label.setText(str(len(self.project.physical_files)))
+            self.log_status(f"Archivos físicos encontrados: {len(self.project.physical_files)}")
+        elif kind == 'folder_structure':
+            self.project.folder_structure = data
+            self.folder_count_label.setText(str(len(self.project.folder_structure)))
+            self.log_status(f"Carpetas encontradas: {len(self.project.folder_structure)}")
+            self.update_folder_tree()
+        elif kind == 'samples':
+            self.project.samples.extend(data)
+            self.samples_count_label.setText(str(len(self.project.samples)))
+    
+    def on_load_finished(self, project):
+        """Completa la carga del proyecto en el hilo de la interfaz"""
+        self.project = project
+        
+        # Actualizar la UI
+        self.update_sample_counts()
+        self.samples_model.set_samples(self.project.samples, self.project.duplicate_index)
+        self.update_samples_view()
+        
+        # Habilitar botones ahora que hay un proyecto cargado
+        self.set_project_actions_enabled(True)
+        
+        # Completar diálogo de progreso
+        self.load_progress.setValue(100)
+        self.close_load_progress()
+        self.log_status(f"Proyecto cargado correctamente en {time.perf_counter() - self.load_start:.2f} s", logging.INFO)
+        self.load_audio_info()
+    
+    def on_load_failed(self, error):
+        """Informa de un error durante la carga y descarta los resultados parciales"""
+        self.close_load_progress()
+        self.clear_loaded_project()
+        self.log_status(f"Error al cargar proyecto: {error}", logging.ERROR)
+        QMessageBox.critical(self, "Error", f"Error al cargar el proyecto: {error}")
+    
+    def on_load_cancelled(self):
+        """Descarta los resultados parciales de una carga cancelada"""
+        self.close_load_progress()
+        self.clear_loaded_project()
+        self.log_status("Carga del proyecto cancelada", logging.WARNING)
+    
+    def clear_loaded_project(self):
+        """Deja la interfaz sin proyecto cargado tras una carga fallida o cancelada"""
+        self.project = AbletonProject(self.current_project)
+        self.samples_model.set_samples([])
+        self.folder_tree.clear()
+        self.update_sample_counts()
+        self.physical_files_count_label.setText("0")
+        self.folder_count_label.setText("0")
+        self.set_project_actions_enabled(False)
+    
+    def set_project_actions_enabled(self, enabled):
+        """Habilita o deshabilita las acciones que requieren un proyecto cargado"""
+        for button in (self.add_prefix_button, self.add_suffix_button, self.replace_button,
+                       self.mark_duplicates_button, self.content_duplicates_button, self.relink_button,
+                       self.collect_button, self.unused_button, self.save_changes_button,
+                       self.rescan_button, self.refresh_folder_button, self.create_folder_button):
+            button.setEnabled(enabled)
+    
+    def scan_project_folder(self):
+        """Escanea los archivos físicos y la estructura de carpetas del proyecto"""
         if not self.project_folder:
             return
             
-        self.folder_structure = {}
-        for root, dirs, files in os.walk(self.project_folder):
-            rel_path = os.path.relpath(root, self.project_folder)
-            if rel_path == '.':
-                rel_path = ''
-                
-            parent_path = os.path.dirname(rel_path)
-            folder_name = os.path.basename(rel_path) if rel_path else '/'
-            
-            # Contar archivos de audio en la carpeta
-            audio_files = [f for f in files if f.lower().endswith(('.wav', '.mp3', '.aiff', '.aif', '.m4a', '.ogg', '.flac'))]
-            
-            folder_info = {
-                'name': folder_name,
-                'path': root,
-                'rel_path': rel_path,
-                'audio_count': len(audio_files),
-                'subfolders': [],
-                'parent': parent_path
-            }
-            
-            self.folder_structure[rel_path] = folder_info
-            
-            # Añadir como subcarpeta al padre
-            if parent_path in self.folder_structure and rel_path:
-                self.folder_structure[parent_path]['subfolders'].append(rel_path)
+        self.project.scan_folder()
         
-        # Actualizar información de carpetas
-        self.folder_count_label.setText(str(len(self.folder_structure)))
-        self.log_status(f"Carpetas encontradas: {len(self.folder_structure)}")
+        # Actualizar información de archivos y carpetas
+        self.physical_files_count_label.setText(str(len(self.project.physical_files)))
+        self.folder_count_label.setText(str(len(self.project.folder_structure)))
+        self.log_status(f"Archivos físicos encontrados: {len(self.project.physical_files)}, "
+                        f"Carpetas encontradas: {len(self.project.folder_structure)}")
     
     def find_samples_in_project(self):
         """Busca samples referenciados en el proyecto Ableton"""
-        if not self.xml_root:
+        if not self.current_project:
             return
-            
-        # Buscar todos los elementos FileRef en el XML
-        self.samples = []
-        file_refs = self.xml_root.findall(".//FileRef")
         
-        for ref in file_refs:
-            try:
-                # Obtener el atributo RelativePath
-                relative_path = ref.find("RelativePath").attrib.get("Value", "")
-                
-                # Obtener el nombre del archivo
-                filename = os.path.basename(relative_path)
-                
-                # Construir la ruta absoluta
-                full_path = os.path.normpath(os.path.join(self.project_folder, relative_path))
-                
-                # Verificar si el archivo existe
-                file_exists = os.path.isfile(full_path)
-                
-                # Obtener el tamaño si existe
-                size = os.path.getsize(full_path) if file_exists else 0
-                
-                # Obtener la carpeta contenedora
-                folder = os.path.dirname(relative_path)
-                
-                # Añadir a la lista de samples
-                self.samples.append({
-                    'name': filename,
-                    'relative_path': relative_path,
-                    'absolute_path': full_path,
-                    'exists': file_exists,
-                    'size': size,
-                    'folder': folder,
-                    'xml_element': ref  # Guardar referencia al elemento XML
-                })
-            except Exception as e:
-                self.log_status(f"Error al procesar FileRef: {str(e)}", logging.ERROR)
-        
-        # Actualizar información
-        self.samples_count_label.setText(str(len(self.samples)))
-        missing_count = sum(1 for s in self.samples if not s['exists'])
+        self.project.find_samples()
+        self.update_sample_counts()
+    
+    def update_sample_counts(self):
+        """Actualiza los contadores de samples y faltantes"""
+        self.samples_count_label.setText(str(len(self.project.samples)))
+        missing_count = sum(1 for s in self.project.samples if not s.exists)
         self.missing_files_count_label.setText(str(missing_count))
-        self.log_status(f"Samples en proyecto: {len(self.samples)}, Faltantes: {missing_count}")
+        self.log_status(f"Samples en proyecto: {len(self.project.samples)}, Faltantes: {missing_count}")
     
-    def update_samples_tree(self):
-        """Actualiza el árbol de samples según los filtros actuales"""
-        # Limpiar el árbol
-        self.samples_tree.clear()
-        
-        # Obtener criterios de filtro
-        search_text = self.search_input.text().lower()
+    def update_samples_view(self, folder_filter=None):
+        """Aplica los filtros actuales a la vista de samples"""
         show_duplicates = self.duplicate_check.isChecked()
-        show_missing = self.missing_check.isChecked()
-        
-        # Recopilar duplicados si es necesario
-        duplicates = {}
-        if show_duplicates:
-            for sample in self.samples:
-                name = sample['name'].lower()
-                if name in duplicates:
-                    duplicates[name].append(sample)
-                else:
-                    duplicates[name] = [sample]
-            # Filtrar solo los que tienen duplicados
-            duplicates = {k: v for k, v in duplicates.items() if len(v) > 1}
-        
-        # Cargar los samples en el árbol
-        for sample in self.samples:
-            # Aplicar filtros
-            if search_text and search_text not in sample['name'].lower():
-                continue
-                
-            if show_duplicates and sample['name'].lower() not in duplicates:
-                continue
-                
-            if show_missing and sample['exists']:
-                continue
-            
-            # Crear el ítem del árbol
-            item = QTreeWidgetItem(self.samples_tree)
-            item.setText(0, sample['name'])
-            item.setText(1, sample['relative_path'])
-            item.setText(2, sample['absolute_path'])
-            item.setText(3, self.format_size(sample['size']))
-            
-            # Estado (Verde si existe, Rojo si falta)
-            status = "Encontrado" if sample['exists'] else "Faltante"
-            item.setText(4, status)
-            
-            # Color según estado
-            if not sample['exists']:
-                item.setForeground(4, QColor(255, 0, 0))  # Rojo para faltantes
-            else:
-                item.setForeground(4, QColor(0, 128, 0))  # Verde para encontrados
-            
-            # Carpeta contenedora
-            item.setText(5, sample['folder'])
-            
-            # Destacar duplicados
-            if show_duplicates and sample['name'].lower() in duplicates:
-                item.setBackground(0, QColor(255, 255, 0, 50))  # Amarillo claro
+        self.samples_model.highlight_duplicates = show_duplicates
+        self.samples_proxy.set_filters(self.search_input.text(), show_duplicates,
+                                       self.missing_check.isChecked(), folder_filter,
+                                       self.format_combo.currentData())
+    
+    def samples_updated(self):
+        """Refresca la vista tras modificar los datos de los samples"""
+        self.samples_model.samples_changed()
+        self.samples_proxy.reset_search()
+        self.samples_proxy.invalidateFilter()
+    
+    def load_audio_info(self):
+        """Lee en segundo plano los metadatos de audio que faltan, sin bloquear la interfaz"""
+        project = self.project
+        task = TaskThread(project.read_audio_info, parent=self)
+        start = time.perf_counter()
+        
+        def finished(infos):
+            self.tasks.discard(task)
+            # Un proyecto recargado mientras tanto tiene sus propios samples
+            if project is not self.project:
+                return
+            project.set_audio_info(infos)
+            self.samples_model.samples_changed()
+            self.update_format_filter()
+            self.log_status(f"Metadatos de audio de {len(infos)} archivos leídos en "
+                            f"{time.perf_counter() - start:.2f} s", logging.DEBUG)
+        
+        def failed(error):
+            self.tasks.discard(task)
+            self.log_status(f"Error al leer metadatos de audio: {error}", logging.WARNING)
+        
+        task.task_finished.connect(finished)
+        task.task_failed.connect(failed)
+        task.task_cancelled.connect(lambda: self.tasks.discard(task))
+        self.tasks.add(task)
+        task.start()
+    
+    def update_format_filter(self):
+        """Actualiza el desplegable de formatos con los presentes en el proyecto"""
+        current = self.format_combo.currentData()
+        formats = sorted({s.audio_info.format for s in self.project.samples if s.audio_info is not None})
+        self.format_combo.blockSignals(True)
+        self.format_combo.clear()
+        self.format_combo.addItem("Todos los formatos", None)
+        for audio_format in formats:
+            self.format_combo.addItem(audio_format, audio_format)
+        self.format_combo.setCurrentIndex(max(self.format_combo.findData(current), 0))
+        self.format_combo.blockSignals(False)
+    
+    def selected_samples(self):
+        """Devuelve los samples seleccionados en la vista, uno por archivo"""
+        rows = sorted(self.samples_proxy.mapToSource(index).row()
+                      for index in self.samples_view.selectionModel().selectedRows())
+        selected = {}
+        for row in rows:
+            sample = self.samples_model.samples[row]
+            selected.setdefault(sample.absolute_path, sample)
+        return list(selected.values())
     
     def update_folder_tree(self):
         """Actualiza el árbol de carpetas"""
-        if not self.folder_structure:
+        if not self.project.folder_structure:
             return
             
         self.folder_tree.clear()
@@ -849,9 +1566,9 @@ class AbletonSampleManager(QMainWindow):
         self.folder_items = {"": root_item}
         
         # Añadir carpetas de primer nivel
-        root_folders = [f for f in self.folder_structure.keys() if f and "/" not in f]
+        root_folders = [f for f in self.project.folder_structure.keys() if f and "/" not in f]
         for folder_path in sorted(root_folders):
-            folder = self.folder_structure[folder_path]
+            folder = self.project.folder_structure[folder_path]
             self.add_folder_to_tree(folder, root_item)
         
         # Expandir el ítem raíz
@@ -860,28 +1577,28 @@ class AbletonSampleManager(QMainWindow):
     def add_folder_to_tree(self, folder, parent_item):
         """Añade una carpeta al árbol de carpetas de forma recursiva"""
         folder_item = QTreeWidgetItem(parent_item)
-        folder_item.setText(0, folder['name'])
-        folder_item.setData(0, Qt.UserRole, folder['rel_path'])
+        folder_item.setText(0, folder.name)
+        folder_item.setData(0, Qt.UserRole, folder.rel_path)
         
         # Guardar referencia al ítem
-        self.folder_items[folder['rel_path']] = folder_item
+        self.folder_items[folder.rel_path] = folder_item
         
         # Añadir subcarpetas
-        for subfolder_path in sorted(folder['subfolders']):
-            subfolder = self.folder_structure[subfolder_path]
+        for subfolder_path in sorted(folder.subfolders):
+            subfolder = self.project.folder_structure[subfolder_path]
             self.add_folder_to_tree(subfolder, folder_item)
     
     def filter_samples(self):
         """Filtra la lista de samples según los criterios definidos"""
-        self.update_samples_tree()
+        self.search_timer.stop()
+        self.update_samples_view()
     
     def show_samples_context_menu(self, position):
         """Muestra un menú contextual para los samples seleccionados"""
         menu = QMenu()
         
         # Obtener elementos seleccionados
-        selected_items = self.samples_tree.selectedItems()
-        if not selected_items:
+        if not self.selected_samples():
             return
             
         # Acciones para samples
@@ -899,8 +1616,14 @@ class AbletonSampleManager(QMainWindow):
         menu.addAction(move_to_action)
         menu.addAction(rename_action)
         
+        # Consultar la biblioteca si ya está indexada
+        if self.library_index is not None:
+            usage_action = QAction("Proyectos que lo usan", self)
+            usage_action.triggered.connect(self.show_sample_usage)
+            menu.addAction(usage_action)
+        
         # Mostrar el menú
-        menu.exec_(self.samples_tree.viewport().mapToGlobal(position))
+        menu.exec_(self.samples_view.viewport().mapToGlobal(position))
     
     def show_folder_context_menu(self, position):
         """Muestra un menú contextual para la carpeta seleccionada"""
@@ -930,12 +1653,12 @@ class AbletonSampleManager(QMainWindow):
     
     def open_containing_folder(self):
         """Abre la carpeta contenedora de los samples seleccionados"""
-        selected_items = self.samples_tree.selectedItems()
-        if not selected_items:
+        selected_samples = self.selected_samples()
+        if not selected_samples:
             return
             
         # Obtener la ruta del primer sample seleccionado
-        abs_path = selected_items[0].text(2)
+        abs_path = selected_samples[0].absolute_path
         folder_path = os.path.dirname(abs_path)
         
         # Abrir la carpeta
@@ -949,13 +1672,7 @@ class AbletonSampleManager(QMainWindow):
         
         # Abrir la carpeta según el sistema operativo
         try:
-            if sys.platform == 'win32':
-                os.startfile(folder_path)
-            elif sys.platform == 'darwin':  # macOS
-                subprocess.call(['open', folder_path])
-            else:  # Linux
-                subprocess.call(['xdg-open', folder_path])
-                
+            open_with_system(folder_path)
             self.log_status(f"Carpeta abierta: {folder_path}")
         except Exception as e:
             self.log_status(f"Error al abrir carpeta: {str(e)}", logging.ERROR)
@@ -984,7 +1701,7 @@ class AbletonSampleManager(QMainWindow):
             self.log_status(f"Carpeta creada: {rel_path}")
             
             # Actualizar la estructura de carpetas
-            self.analyze_folder_structure()
+            self.scan_project_folder()
             self.update_folder_tree()
         except Exception as e:
             self.log_status(f"Error al crear carpeta: {str(e)}", logging.ERROR)
@@ -1007,7 +1724,7 @@ class AbletonSampleManager(QMainWindow):
             self.log_status(f"Subcarpeta creada: {rel_path}")
             
             # Actualizar la estructura de carpetas
-            self.analyze_folder_structure()
+            self.scan_project_folder()
             self.update_folder_tree()
         except Exception as e:
             self.log_status(f"Error al crear subcarpeta: {str(e)}", logging.ERROR)
@@ -1024,39 +1741,16 @@ class AbletonSampleManager(QMainWindow):
         self.missing_check.setChecked(False)
         
         # Filtrar samples por carpeta
-        self.samples_tree.clear()
-        for sample in self.samples:
-            # Comprobar si el sample está en esta carpeta o subcarpeta
-            sample_folder = sample['folder']
-            if sample_folder == folder_path or sample_folder.startswith(folder_path + "/"):
-                # Crear el ítem del árbol
-                item = QTreeWidgetItem(self.samples_tree)
-                item.setText(0, sample['name'])
-                item.setText(1, sample['relative_path'])
-                item.setText(2, sample['absolute_path'])
-                item.setText(3, self.format_size(sample['size']))
-                
-                # Estado (Verde si existe, Rojo si falta)
-                status = "Encontrado" if sample['exists'] else "Faltante"
-                item.setText(4, status)
-                
-                # Color según estado
-                if not sample['exists']:
-                    item.setForeground(4, QColor(255, 0, 0))  # Rojo para faltantes
-                else:
-                    item.setForeground(4, QColor(0, 128, 0))  # Verde para encontrados
-                
-                # Carpeta contenedora
-                item.setText(5, sample['folder'])
+        self.update_samples_view(folder_filter=folder_path)
     
     def move_samples_to_folder(self):
         """Mueve los samples seleccionados a otra carpeta"""
-        selected_items = self.samples_tree.selectedItems()
-        if not selected_items:
+        selected_samples = self.selected_samples()
+        if not selected_samples:
             return
             
         # Obtener lista de carpetas
-        folder_list = list(self.folder_structure.keys())
+        folder_list = list(self.project.folder_structure.keys())
         
         # Mostrar diálogo para seleccionar carpeta
         dialog = MoveToBatchDialog(folder_list, self)
@@ -1077,64 +1771,28 @@ class AbletonSampleManager(QMainWindow):
                 return
         
         # Mostrar diálogo de progreso
-        progress = QProgressDialog("Moviendo archivos...", "Cancelar", 0, len(selected_items), self)
+        progress = QProgressDialog("Moviendo archivos...", "Cancelar", 0, len(selected_samples), self)
         progress.setWindowTitle("Moviendo archivos")
         progress.setWindowModality(Qt.WindowModal)
         progress.show()
         
         # Mover cada archivo
         moved_count = 0
-        for i, item in enumerate(selected_items):
+        for i, selected in enumerate(selected_samples):
             progress.setValue(i)
             
-            # Obtener información del sample
-            sample_name = item.text(0)
-            abs_path = item.text(2)
-            
-            # Comprobar si el archivo existe
-            if not os.path.isfile(abs_path):
-                self.log_status(f"Archivo no encontrado: {abs_path}", logging.WARNING)
-                continue
-                
-            # Ruta destino
-            new_abs_path = os.path.join(self.project_folder, target_folder, sample_name)
-            
-            # Mover el archivo
+            # Mover el archivo y actualizar todos los FileRef que lo usan
             try:
-                # Crear carpeta destino si no existe
-                os.makedirs(os.path.dirname(new_abs_path), exist_ok=True)
-                
-                # Mover el archivo
-                shutil.move(abs_path, new_abs_path)
-                
-                # Calcular nueva ruta relativa
-                new_rel_path = os.path.join(target_folder, sample_name)
-                
-                # Actualizar la información en el XML
-                for sample in self.samples:
-                    if sample['name'] == sample_name and sample['absolute_path'] == abs_path:
-                        # Actualizar ruta relativa en el XML
-                        rel_path_elem = sample['xml_element'].find("RelativePath")
-                        if rel_path_elem is not None:
-                            rel_path_elem.set("Value", new_rel_path)
-                            
-                        # Actualizar datos en memoria
-                        sample['relative_path'] = new_rel_path
-                        sample['absolute_path'] = new_abs_path
-                        sample['folder'] = target_folder
-                        
-                        # Actualizar ítem en la UI
-                        item.setText(1, new_rel_path)
-                        item.setText(2, new_abs_path)
-                        item.setText(5, target_folder)
-                
+                self.project.move_sample(selected, target_folder)
                 moved_count += 1
-                
+            except FileNotFoundError as e:
+                self.log_status(str(e), logging.WARNING)
             except Exception as e:
-                self.log_status(f"Error al mover archivo {sample_name}: {str(e)}", logging.ERROR)
+                self.log_status(f"Error al mover archivo {selected.name}: {str(e)}", logging.ERROR)
         
         # Completar el proceso
-        progress.setValue(len(selected_items))
+        progress.setValue(len(selected_samples))
+        self.samples_updated()
         self.log_status(f"Movidos {moved_count} archivos a {target_folder}")
         
         # Recordar guardar los cambios
@@ -1144,8 +1802,8 @@ class AbletonSampleManager(QMainWindow):
     
     def add_prefix(self):
         """Añade un prefijo a los samples seleccionados"""
-        selected_items = self.samples_tree.selectedItems()
-        if not selected_items:
+        selected_samples = self.selected_samples()
+        if not selected_samples:
             return
             
         # Pedir el prefijo
@@ -1154,13 +1812,14 @@ class AbletonSampleManager(QMainWindow):
             return
             
         # Aplicar el prefijo a cada sample seleccionado
-        for item in selected_items:
-            self.rename_sample_item(item, f"{prefix}{item.text(0)}")
+        for sample in selected_samples:
+            self.rename_sample_item(sample, f"{prefix}{sample.name}")
+        self.samples_updated()
     
     def add_suffix(self):
         """Añade un sufijo a los samples seleccionados"""
-        selected_items = self.samples_tree.selectedItems()
-        if not selected_items:
+        selected_samples = self.selected_samples()
+        if not selected_samples:
             return
             
         # Pedir el sufijo
@@ -1169,16 +1828,17 @@ class AbletonSampleManager(QMainWindow):
             return
             
         # Aplicar el sufijo a cada sample seleccionado
-        for item in selected_items:
+        for sample in selected_samples:
             # Obtener nombre y extensión
-            name, ext = os.path.splitext(item.text(0))
+            name, ext = os.path.splitext(sample.name)
             # Aplicar el sufijo antes de la extensión
-            self.rename_sample_item(item, f"{name}{suffix}{ext}")
+            self.rename_sample_item(sample, f"{name}{suffix}{ext}")
+        self.samples_updated()
     
     def replace_text(self):
         """Reemplaza texto en los nombres de samples seleccionados"""
-        selected_items = self.samples_tree.selectedItems()
-        if not selected_items:
+        selected_samples = self.selected_samples()
+        if not selected_samples:
             return
             
         # Pedir el texto a buscar
@@ -1192,87 +1852,40 @@ class AbletonSampleManager(QMainWindow):
             return
             
         # Aplicar el reemplazo a cada sample seleccionado
-        for item in selected_items:
-            new_name = item.text(0).replace(search_text, replace_text)
-            if new_name != item.text(0):
-                self.rename_sample_item(item, new_name)
+        for sample in selected_samples:
+            new_name = sample.name.replace(search_text, replace_text)
+            if new_name != sample.name:
+                self.rename_sample_item(sample, new_name)
+        self.samples_updated()
     
-    def rename_sample_item(self, item, new_name):
+    def rename_sample_item(self, selected, new_name):
         """Renombra un sample en el filesystem y en el XML"""
-        old_name = item.text(0)
-        old_abs_path = item.text(2)
-        old_rel_path = item.text(1)
-        
-        # Comprobar si el archivo existe
-        if not os.path.isfile(old_abs_path):
-            self.log_status(f"Archivo no encontrado: {old_abs_path}", logging.WARNING)
-            return False
-            
-        # Calcular nueva ruta
-        folder = os.path.dirname(old_abs_path)
-        new_abs_path = os.path.join(folder, new_name)
-        
-        # Comprobar si el nuevo nombre ya existe
-        if os.path.exists(new_abs_path):
-            self.log_status(f"Ya existe un archivo con el nombre: {new_name}", logging.WARNING)
-            return False
-            
-        # Renombrar el archivo
+        old_name = selected.name
         try:
-            shutil.move(old_abs_path, new_abs_path)
-            
-            # Calcular nueva ruta relativa
-            new_rel_path = os.path.join(os.path.dirname(old_rel_path), new_name)
-            
-            # Actualizar la información en el XML
-            for sample in self.samples:
-                if sample['name'] == old_name and sample['absolute_path'] == old_abs_path:
-                    # Actualizar ruta relativa en el XML
-                    rel_path_elem = sample['xml_element'].find("RelativePath")
-                    if rel_path_elem is not None:
-                        rel_path_elem.set("Value", new_rel_path)
-                        
-                    # Actualizar datos en memoria
-                    sample['name'] = new_name
-                    sample['relative_path'] = new_rel_path
-                    sample['absolute_path'] = new_abs_path
-                    
-                    # Actualizar ítem en la UI
-                    item.setText(0, new_name)
-                    item.setText(1, new_rel_path)
-                    item.setText(2, new_abs_path)
-                    
+            self.project.rename_sample(selected, new_name)
             self.log_status(f"Archivo renombrado: {old_name} -> {new_name}")
             return True
-            
+        except (FileNotFoundError, FileExistsError) as e:
+            self.log_status(str(e), logging.WARNING)
+            return False
         except Exception as e:
             self.log_status(f"Error al renombrar archivo: {str(e)}", logging.ERROR)
             return False
     
     def save_changes(self):
         """Guarda los cambios al proyecto Ableton"""
-        if not self.xml_tree or not self.current_project:
+        if not self.current_project:
+            return
+        
+        if not self.project.edited_samples():
+            QMessageBox.information(self, "Guardar cambios", "No hay cambios que guardar.")
             return
             
         try:
-            # Crear una copia de respaldo del archivo original
-            backup_file = f"{self.current_project}.backup"
-            shutil.copy2(self.current_project, backup_file)
-            self.log_status(f"Creada copia de respaldo: {backup_file}")
-            
-            # Guardar el XML modificado
-            self.xml_tree.write(self.temp_xml, encoding="UTF-8", xml_declaration=True, pretty_print=True)
-            
-            # Comprimir el XML de vuelta a formato .als
-            with open(self.temp_xml, 'rb') as f_in:
-                with subprocess.Popen(['gzip', '-c'], stdin=subprocess.PIPE, stdout=subprocess.PIPE) as proc:
-                    compressed_data, _ = proc.communicate(input=f_in.read())
-                    
-                    # Escribir el archivo comprimido
-                    with open(self.current_project, 'wb') as f_out:
-                        f_out.write(compressed_data)
-            
-            self.log_status(f"Cambios guardados en: {self.current_project}")
+            # Crea la copia .backup y parchea o reescribe el .als
+            mode = self.project.save()
+            self.log_status(f"Cambios guardados en: {self.current_project} "
+                            f"({'parche' if mode == 'patch' else 'completo'})")
             QMessageBox.information(self, "Cambios guardados", "Los cambios se han guardado correctamente en el proyecto.")
             
         except Exception as e:
@@ -1288,12 +1901,12 @@ class AbletonSampleManager(QMainWindow):
     
     def rename_sample(self):
         """Renombra el sample seleccionado"""
-        selected_items = self.samples_tree.selectedItems()
-        if not selected_items or len(selected_items) != 1:
+        selected_samples = self.selected_samples()
+        if not selected_samples or len(selected_samples) != 1:
             return
             
-        item = selected_items[0]
-        old_name = item.text(0)
+        sample = selected_samples[0]
+        old_name = sample.name
         
         # Pedir el nuevo nombre
         new_name, ok = QInputDialog.getText(self, "Renombrar sample", "Nuevo nombre:", text=old_name)
@@ -1301,38 +1914,302 @@ class AbletonSampleManager(QMainWindow):
             return
             
         # Renombrar el sample
-        self.rename_sample_item(item, new_name)
+        self.rename_sample_item(sample, new_name)
+        self.samples_updated()
     
     def mark_duplicates(self):
         """Marca los samples duplicados en la lista"""
         # Activar la casilla de verificación para mostrar duplicados
         self.duplicate_check.setChecked(True)
         
-        # Identificar duplicados
-        duplicates = {}
-        for sample in self.samples:
-            name = sample['name'].lower()
-            if name in duplicates:
-                duplicates[name].append(sample)
-            else:
-                duplicates[name] = [sample]
-        
-        # Filtrar solo los que tienen duplicados
-        duplicates = {k: v for k, v in duplicates.items() if len(v) > 1}
-        
-        if not duplicates:
+        # Los contadores se mantienen en el índice de duplicados
+        if not self.project.duplicate_index.duplicate_groups:
             QMessageBox.information(self, "Duplicados", "No se encontraron samples duplicados.")
             return
         
-        # Contar duplicados
-        total_duplicates = sum(len(v) for v in duplicates.values()) - len(duplicates)
-        
         # Mostrar mensaje con resultados
         QMessageBox.information(self, "Duplicados", 
-                            f"Se encontraron {len(duplicates)} nombres de archivo duplicados, "
-                            f"con un total de {total_duplicates} archivos duplicados.\n\n"
+                            f"Se encontraron {self.project.duplicate_index.duplicate_groups} nombres de archivo duplicados, "
+                            f"con un total de {self.project.duplicate_index.duplicate_count} archivos duplicados.\n\n"
                             "Se han filtrado los resultados para mostrar solo los duplicados.")
 
+    def find_content_duplicates(self):
+        """Busca archivos de audio con contenido idéntico en la carpeta del proyecto"""
+        if not self.project.physical_files:
+            return
+            
+        self.log_status("Buscando duplicados por contenido...")
+        self.run_task("Duplicados por contenido", "Comparando contenido de archivos...",
+                      self.show_content_duplicates, find_content_duplicates, self.project.physical_files)
+    
+    def show_content_duplicates(self, duplicates):
+        """Muestra los grupos de archivos de contenido idéntico"""
+        self.log_status(f"Grupos de archivos idénticos: {len(duplicates)}")
+        if not duplicates:
+            QMessageBox.information(self, "Duplicados", "No se encontraron archivos con contenido idéntico.")
+            return
+        dialog = ContentDuplicatesDialog(duplicates, self.project_folder, self)
+        dialog.exec_()
+    
+    # Métodos para reubicar samples faltantes
+    def configure_relink_roots(self):
+        """Edita las carpetas de bibliotecas de samples; devuelve False si se cancela"""
+        dialog = LibraryRootsDialog(self.settings.value("relink/library_roots", [], type=list), self)
+        if dialog.exec_() != QDialog.Accepted:
+            return False
+        self.settings.setValue("relink/library_roots", dialog.get_roots())
+        return True
+    
+    def relink_missing_samples(self):
+        """Busca los samples faltantes en las bibliotecas de samples configuradas"""
+        if not any(not s.exists for s in self.project.samples):
+            QMessageBox.information(self, "Reubicar faltantes", "No hay samples faltantes.")
+            return
+        
+        # Pedir las bibliotecas la primera vez
+        roots = self.settings.value("relink/library_roots", [], type=list)
+        if not roots:
+            if not self.configure_relink_roots():
+                return
+            roots = self.settings.value("relink/library_roots", [], type=list)
+            if not roots:
+                return
+        
+        # El índice se reutiliza mientras no cambien las bibliotecas
+        if self.relink_index is not None and self.relink_index.roots == roots:
+            self.show_relink_plan(self.relink_index)
+            return
+        
+        self.log_status(f"Indexando bibliotecas de samples: {', '.join(roots)}")
+        self.run_task("Reubicar faltantes", "Indexando bibliotecas de samples...",
+                      self.show_relink_plan, build_library_index, roots)
+    
+    def show_relink_plan(self, library_index):
+        """Empareja los samples faltantes con la biblioteca y aplica lo que se acepte"""
+        self.relink_index = library_index
+        self.log_status(f"Bibliotecas indexadas: {library_index.file_count} archivos de audio")
+        
+        plan = plan_relink(self.project.samples, library_index)
+        dialog = RelinkDialog(plan, self)
+        if dialog.exec_() != QDialog.Accepted:
+            # Volver a indexar si se han cambiado las bibliotecas
+            if dialog.change_roots and self.configure_relink_roots():
+                self.relink_missing_samples()
+            return
+        
+        relinked = 0
+        for sample, path, size in dialog.get_relinks():
+            old_path = sample.relative_path
+            self.project.relink_sample(sample, path, size)
+            self.log_status(f"Sample reubicado: {old_path} -> {path}")
+            relinked += 1
+        
+        self.update_sample_counts()
+        self.samples_updated()
+        self.load_audio_info()
+        QMessageBox.information(self, "Samples reubicados",
+                                f"Se han reubicado {relinked} samples.\n"
+                                "No olvide guardar los cambios para actualizar el proyecto.")
+    
+    # Métodos para recopilar los samples externos
+    def collect_and_save(self):
+        """Copia al proyecto los samples que están fuera de su carpeta y guarda"""
+        external = self.project.external_samples()
+        if not external:
+            QMessageBox.information(self, "Recopilar y guardar", "Todos los samples están ya dentro del proyecto.")
+            return
+        
+        total_size = sum(sample.size for sample in external)
+        reply = QMessageBox.question(self, "Recopilar y guardar",
+                                     f"Se copiarán {len(external)} archivos externos ({format_size(total_size)}) "
+                                     f"a {os.path.join(self.project_folder, COLLECT_FOLDER)} y se guardará el proyecto.\n\n"
+                                     "¿Desea continuar?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        
+        self.log_status(f"Recopilando {len(external)} samples externos...")
+        self.run_task("Recopilar y guardar", "Copiando samples externos...",
+                      self.on_samples_collected, self.project.collect_external_samples)
+    
+    def on_samples_collected(self, result):
+        """Apunta los FileRef a las copias y guarda el proyecto"""
+        collected, errors = result
+        reused = 0
+        for sample, destination, reuse in collected:
+            self.project.relink_sample(sample, destination, sample.size)
+            reused += reuse
+        
+        self.samples_updated()
+        self.load_audio_info()
+        self.log_status(f"Samples recopilados: {len(collected) - reused} copiados, {reused} ya estaban en el proyecto")
+        if errors:
+            details = "\n".join(f"{path}: {error}" for path, error in errors[:10])
+            QMessageBox.warning(self, "Recopilar y guardar",
+                                f"No se pudieron copiar {len(errors)} archivos:\n{details}")
+        if collected:
+            self.save_changes()
+    
+    # Métodos para el audio sin usar
+    def find_unused_audio(self):
+        """Busca el audio de la carpeta del proyecto que no usa ningún .als"""
+        if not self.project.samples:
+            # Sin samples analizados todo el audio parecería sin usar
+            QMessageBox.warning(self, "Audio sin usar", "El proyecto no tiene samples analizados; cárguelo antes de buscar audio sin usar.")
+            return
+        self.log_status("Buscando audio sin usar...")
+        self.run_task("Audio sin usar", "Comparando archivos y referencias...",
+                      self.show_unused_audio, self.project.find_unused_audio)
+    
+    def show_unused_audio(self, report):
+        """Muestra el audio sin usar y lo retira según la acción elegida"""
+        if not self.project.samples:
+            # El proyecto se ha vuelto a cargar sin éxito mientras se buscaba
+            self.log_status("Audio sin usar: el proyecto ya no tiene samples cargados", logging.WARNING)
+            return
+        self.log_status(f"Audio sin usar: {len(report.files)} archivos, {format_size(report.total_size)}")
+        if not report.files:
+            QMessageBox.information(self, "Audio sin usar", "Todos los archivos de audio están en uso.")
+            return
+        
+        dialog = UnusedAudioDialog(report, self.project_folder, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        paths = dialog.get_selected_paths()
+        
+        if dialog.action == UnusedAudioDialog.ARCHIVE:
+            archive_folder = QFileDialog.getExistingDirectory(self, "Carpeta de archivo",
+                                                              os.path.dirname(self.project_folder))
+            if not archive_folder:
+                return
+            inside = os.path.join(os.path.normcase(os.path.abspath(self.project_folder)), '')
+            if os.path.join(os.path.normcase(os.path.abspath(archive_folder)), '').startswith(inside):
+                QMessageBox.warning(self, "Audio sin usar",
+                                    "La carpeta de archivo debe estar fuera de la carpeta del proyecto.")
+                return
+            self.run_task("Audio sin usar", "Archivando archivos...", self.on_unused_audio_removed,
+                          archive_files, paths, self.project_folder, archive_folder)
+        else:
+            reply = QMessageBox.question(self, "Audio sin usar",
+                                         f"¿Mover {len(paths)} archivos a la papelera?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
+            self.run_task("Audio sin usar", "Moviendo a la papelera...", self.on_unused_audio_removed,
+                          dispose_files, paths, move_to_trash)
+    
+    def on_unused_audio_removed(self, result):
+        """Informa del resultado y actualiza la carpeta del proyecto"""
+        removed, errors = result
+        self.log_status(f"Archivos sin usar retirados: {len(removed)}")
+        if errors:
+            details = "\n".join(f"{path}: {error}" for path, error in errors[:10])
+            QMessageBox.warning(self, "Audio sin usar",
+                                f"No se pudieron retirar {len(errors)} archivos:\n{details}")
+        self.scan_project_folder()
+        self.update_folder_tree()
+    
+    # Métodos para la biblioteca de proyectos
+    def browse_library_root(self):
+        folder = QFileDialog.getExistingDirectory(self, "Seleccionar carpeta raíz de proyectos")
+        if folder:
+            self.library_root.setText(folder)
+            self.scan_library_button.setEnabled(True)
+    
+    def scan_library(self):
+        """Indexa en segundo plano todos los proyectos bajo la carpeta raíz"""
+        root = self.library_root.text()
+        if not root:
+            return
+        
+        self.log_status(f"Indexando proyectos en: {root}")
+        scan_start = time.perf_counter()
+        self.run_task("Biblioteca de proyectos", "Indexando proyectos...",
+                      lambda index: self.on_library_scanned(index, time.perf_counter() - scan_start),
+                      scan_projects, root)
+    
+    def on_library_scanned(self, index, elapsed):
+        """Muestra el resultado de indexar la biblioteca"""
+        self.library_index = index
+        summary = (f"{len(index.projects)} proyectos, {len(index.by_sample)} samples distintos "
+                   f"({elapsed:.1f} s)")
+        if index.errors:
+            summary += f", {len(index.errors)} proyectos con errores"
+        self.library_summary.setText(summary)
+        self.log_status(f"Biblioteca indexada: {summary}")
+        self.update_library_results()
+    
+    def update_library_results(self):
+        """Muestra los samples de la biblioteca que coinciden con la búsqueda"""
+        self.library_tree.clear()
+        text = self.library_search.text().strip()
+        if self.library_index is None or not text:
+            return
+        
+        results = self.library_index.search(text, limit=LIBRARY_RESULTS_LIMIT)
+        for sample_path, projects in results:
+            sample_item = QTreeWidgetItem(self.library_tree)
+            sample_item.setText(0, sample_path)
+            sample_item.setText(1, str(len(projects)))
+            for als_path in projects:
+                project_item = QTreeWidgetItem(sample_item)
+                project_item.setText(0, als_path)
+        if len(results) == 1:
+            self.library_tree.topLevelItem(0).setExpanded(True)
+    
+    def show_sample_usage(self):
+        """Busca en la biblioteca los proyectos que usan el sample seleccionado"""
+        selected = self.selected_samples()
+        if not selected:
+            return
+        self.tabs.setCurrentWidget(self.library_tab)
+        self.library_search.setText(selected[0].absolute_path)
+        self.update_library_results()
+    
+    def run_task(self, title, label, on_finished, function, *args, **kwargs):
+        """Ejecuta una función en segundo plano con un diálogo de progreso cancelable"""
+        progress = QProgressDialog(label, "Cancelar", 0, 0, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        
+        task = TaskThread(function, *args, parent=self, **kwargs)
+        
+        def update_progress(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+        
+        def finish():
+            progress.canceled.disconnect(task.requestInterruption)
+            progress.close()
+            self.tasks.discard(task)
+        
+        def failed(error):
+            finish()
+            self.log_status(f"Error en {title.lower()}: {error}", logging.ERROR)
+            QMessageBox.critical(self, "Error", f"Error en {title.lower()}: {error}")
+        
+        def cancelled():
+            finish()
+            self.log_status(f"{title}: operación cancelada", logging.WARNING)
+        
+        def finished(result):
+            finish()
+            on_finished(result)
+        
+        progress.canceled.connect(task.requestInterruption)
+        task.progress.connect(update_progress)
+        task.task_finished.connect(finished)
+        task.task_failed.connect(failed)
+        task.task_cancelled.connect(cancelled)
+        
+        # Mantener la referencia mientras se ejecuta
+        self.tasks.add(task)
+        task.start()
+        progress.show()
+        return task
+
     # Métodos para explorador de archivos
     def browse_folder(self):
         """Abre un diálogo para seleccionar una carpeta"""
@@ -1411,7 +2288,7 @@ class AbletonSampleManager(QMainWindow):
                 # Tamaño
                 try:
                     size = os.path.getsize(full_path)
-                    item.setText(2, self.format_size(size))
+                    item.setText(2, format_size(size))
                 except:
                     item.setText(2, "")
                 
@@ -1436,17 +2313,35 @@ class AbletonSampleManager(QMainWindow):
             # Si es una carpeta, navegar a ella
             self.current_path.setText(path)
             self.refresh_explorer()
+        elif HAS_NUMPY and path.lower().endswith(PEAK_EXTENSIONS):
+            # Si es audio PCM, mostrar la forma de onda
+            self.preview_waveform(path)
         else:
-            # Si es un archivo, intentar abrirlo
-            try:
-                if sys.platform == 'win32':
-                    os.startfile(path)
-                elif sys.platform == 'darwin':  # macOS
-                    subprocess.call(['open', path])
-                else:  # Linux
-                    subprocess.call(['xdg-open', path])
-            except Exception as e:
-                self.log_status(f"Error al abrir archivo: {str(e)}", logging.ERROR)
+            # Si es otro archivo, intentar abrirlo
+            self.open_file(path)
+    
+    def open_file(self, path):
+        """Abre un archivo con la aplicación del sistema"""
+        try:
+            open_with_system(path)
+        except Exception as e:
+            self.log_status(f"Error al abrir archivo: {str(e)}", logging.ERROR)
+    
+    def preview_waveform(self, path):
+        """Muestra la forma de onda de un archivo, calculando sus picos si no están en caché"""
+        peaks = cached_peaks(path)
+        if peaks is not None:
+            self.show_waveform(path, peaks)
+            return
+        self.run_task("Forma de onda", "Calculando picos...",
+                      lambda peaks: self.show_waveform(path, peaks), load_peaks, path)
+    
+    def show_waveform(self, path, peaks):
+        if peaks is None:
+            # Formato sin vista previa (WAV comprimido, AIFF-C...)
+            self.open_file(path)
+            return
+        WaveformDialog(path, peaks, self).exec_()
 
     def show_explorer_context_menu(self, position):
         """Muestra un menú contextual en el explorador de archivos"""
@@ -1618,7 +2513,7 @@ class AbletonSampleManager(QMainWindow):
                 # Tamaño
                 try:
                     size = os.path.getsize(full_path)
-                    item.setText(2, self.format_size(size))
+                    item.setText(2, format_size(size))
                 except:
                     item.setText(2, "")
                 
@@ -1634,10 +2529,14 @@ class AbletonSampleManager(QMainWindow):
         except Exception as e:
             self.log_status(f"Error al buscar archivos: {str(e)}", logging.ERROR)
 
+    def selected_batch_files(self):
+        """Devuelve (nombre, ruta completa) de los archivos seleccionados en la pestaña de lotes"""
+        return [(item.text(0), item.data(0, Qt.UserRole)) for item in self.batch_files_tree.selectedItems()]
+    
     def batch_add_prefix(self):
         """Añade un prefijo a los archivos seleccionados"""
-        selected_items = self.batch_files_tree.selectedItems()
-        if not selected_items:
+        selected_files = self.selected_batch_files()
+        if not selected_files:
             QMessageBox.warning(self, "Advertencia", "No hay archivos seleccionados")
             return
             
@@ -1645,41 +2544,15 @@ class AbletonSampleManager(QMainWindow):
         prefix, ok = QInputDialog.getText(self, "Añadir prefijo", "Prefijo a añadir:")
         if not ok or not prefix:
             return
-            
-        # Mostrar diálogo de progreso
-        progress = QProgressDialog("Renombrando archivos...", "Cancelar", 0, len(selected_items), self)
-        progress.setWindowTitle("Añadiendo prefijo")
-        progress.setWindowModality(Qt.WindowModal)
-        progress.show()
-        
-        # Procesar cada archivo
-        renamed_count = 0
-        for i, item in enumerate(selected_items):
-            progress.setValue(i)
-            
-            full_path = item.data(0, Qt.UserRole)
-            filename = item.text(0)
-            new_name = f"{prefix}{filename}"
-            new_path = os.path.join(os.path.dirname(full_path), new_name)
-            
-            # Renombrar
-            try:
-                os.rename(full_path, new_path)
-                renamed_count += 1
-            except Exception as e:
-                self.log_status(f"Error al renombrar {filename}: {str(e)}", logging.ERROR)
-        
-        # Completar
-        progress.setValue(len(selected_items))
-        self.log_status(f"Renombrados {renamed_count} archivos")
         
-        # Actualizar vista
-        self.apply_batch_filters()
+        moves = [(full_path, os.path.join(os.path.dirname(full_path), f"{prefix}{filename}"))
+                 for filename, full_path in selected_files]
+        self.run_batch("Añadir prefijo", f"Añadir prefijo '{prefix}'", moves)
 
     def batch_add_suffix(self):
         """Añade un sufijo a los archivos seleccionados"""
-        selected_items = self.batch_files_tree.selectedItems()
-        if not selected_items:
+        selected_files = self.selected_batch_files()
+        if not selected_files:
             QMessageBox.warning(self, "Advertencia", "No hay archivos seleccionados")
             return
             
@@ -1687,44 +2560,18 @@ class AbletonSampleManager(QMainWindow):
         suffix, ok = QInputDialog.getText(self, "Añadir sufijo", "Sufijo a añadir:")
         if not ok or not suffix:
             return
-            
-        # Mostrar diálogo de progreso
-        progress = QProgressDialog("Renombrando archivos...", "Cancelar", 0, len(selected_items), self)
-        progress.setWindowTitle("Añadiendo sufijo")
-        progress.setWindowModality(Qt.WindowModal)
-        progress.show()
         
-        # Procesar cada archivo
-        renamed_count = 0
-        for i, item in enumerate(selected_items):
-            progress.setValue(i)
-            
-            full_path = item.data(0, Qt.UserRole)
-            filename = item.text(0)
-            
+        moves = []
+        for filename, full_path in selected_files:
             # Separar nombre y extensión
             name, ext = os.path.splitext(filename)
-            new_name = f"{name}{suffix}{ext}"
-            new_path = os.path.join(os.path.dirname(full_path), new_name)
-            
-            # Renombrar
-            try:
-                os.rename(full_path, new_path)
-                renamed_count += 1
-            except Exception as e:
-                self.log_status(f"Error al renombrar {filename}: {str(e)}", logging.ERROR)
-        
-        # Completar
-        progress.setValue(len(selected_items))
-        self.log_status(f"Renombrados {renamed_count} archivos")
-        
-        # Actualizar vista
-        self.apply_batch_filters()
+            moves.append((full_path, os.path.join(os.path.dirname(full_path), f"{name}{suffix}{ext}")))
+        self.run_batch("Añadir sufijo", f"Añadir sufijo '{suffix}'", moves)
 
     def batch_replace_text(self):
         """Reemplaza texto en los nombres de los archivos seleccionados"""
-        selected_items = self.batch_files_tree.selectedItems()
-        if not selected_items:
+        selected_files = self.selected_batch_files()
+        if not selected_files:
             QMessageBox.warning(self, "Advertencia", "No hay archivos seleccionados")
             return
             
@@ -1737,46 +2584,16 @@ class AbletonSampleManager(QMainWindow):
         replace_text, ok = QInputDialog.getText(self, "Reemplazar texto", "Reemplazar con:")
         if not ok:  # Permite reemplazar con cadena vacía
             return
-            
-        # Mostrar diálogo de progreso
-        progress = QProgressDialog("Renombrando archivos...", "Cancelar", 0, len(selected_items), self)
-        progress.setWindowTitle("Reemplazando texto")
-        progress.setWindowModality(Qt.WindowModal)
-        progress.show()
         
-        # Procesar cada archivo
-        renamed_count = 0
-        for i, item in enumerate(selected_items):
-            progress.setValue(i)
-            
-            full_path = item.data(0, Qt.UserRole)
-            filename = item.text(0)
-            
-            # Aplicar reemplazo
-            new_name = filename.replace(search_text, replace_text)
-            if new_name == filename:  # No hay cambios
-                continue
-                
-            new_path = os.path.join(os.path.dirname(full_path), new_name)
-            
-            # Renombrar
-            try:
-                os.rename(full_path, new_path)
-                renamed_count += 1
-            except Exception as e:
-                self.log_status(f"Error al renombrar {filename}: {str(e)}", logging.ERROR)
-        
-        # Completar
-        progress.setValue(len(selected_items))
-        self.log_status(f"Renombrados {renamed_count} archivos")
-        
-        # Actualizar vista
-        self.apply_batch_filters()
+        # Los nombres sin cambios no entran en el lote
+        moves = [(full_path, os.path.join(os.path.dirname(full_path), filename.replace(search_text, replace_text)))
+                 for filename, full_path in selected_files if search_text in filename]
+        self.run_batch("Reemplazar texto", f"Reemplazar '{search_text}' por '{replace_text}'", moves)
 
     def batch_move_to_folder(self):
         """Mueve los archivos seleccionados a otra carpeta"""
-        selected_items = self.batch_files_tree.selectedItems()
-        if not selected_items:
+        selected_files = self.selected_batch_files()
+        if not selected_files:
             QMessageBox.warning(self, "Advertencia", "No hay archivos seleccionados")
             return
             
@@ -1795,59 +2612,16 @@ class AbletonSampleManager(QMainWindow):
         if dialog.exec_() != QDialog.Accepted:
             return
             
+        # Una carpeta nueva la crea el propio lote (y la elimina al deshacerlo)
         target_folder, is_new = dialog.get_selected_folder()
-        
-        if is_new:
-            # Crear nueva carpeta
-            abs_path = os.path.join(base_folder, target_folder)
-            try:
-                os.makedirs(abs_path, exist_ok=True)
-                self.log_status(f"Carpeta creada: {target_folder}")
-            except Exception as e:
-                self.log_status(f"Error al crear carpeta: {str(e)}", logging.ERROR)
-                QMessageBox.warning(self, "Error", f"No se pudo crear la carpeta: {str(e)}")
-                return
-        
-        # Mostrar diálogo de progreso
-        progress = QProgressDialog("Moviendo archivos...", "Cancelar", 0, len(selected_items), self)
-        progress.setWindowTitle("Moviendo archivos")
-        progress.setWindowModality(Qt.WindowModal)
-        progress.show()
-        
-        # Mover cada archivo
-        moved_count = 0
-        for i, item in enumerate(selected_items):
-            progress.setValue(i)
-            
-            full_path = item.data(0, Qt.UserRole)
-            filename = item.text(0)
-            
-            # Ruta destino
-            dest_path = os.path.join(base_folder, target_folder, filename)
-            
-            # Comprobar si ya existe
-            if os.path.exists(dest_path):
-                self.log_status(f"Ya existe un archivo con el nombre {filename} en la carpeta destino", logging.WARNING)
-                continue
-            
-            # Mover
-            try:
-                shutil.move(full_path, dest_path)
-                moved_count += 1
-            except Exception as e:
-                self.log_status(f"Error al mover {filename}: {str(e)}", logging.ERROR)
-        
-        # Completar
-        progress.setValue(len(selected_items))
-        self.log_status(f"Movidos {moved_count} archivos a {target_folder}")
-        
-        # Actualizar vista
-        self.apply_batch_filters()
+        moves = [(full_path, os.path.join(base_folder, target_folder, filename))
+                 for filename, full_path in selected_files]
+        self.run_batch("Mover a carpeta", f"Mover a {target_folder}", moves)
 
     def batch_create_folder_with_selected(self):
         """Crea una nueva carpeta y mueve los archivos seleccionados a ella"""
-        selected_items = self.batch_files_tree.selectedItems()
-        if not selected_items:
+        selected_files = self.selected_batch_files()
+        if not selected_files:
             QMessageBox.warning(self, "Advertencia", "No hay archivos seleccionados")
             return
             
@@ -1859,59 +2633,63 @@ class AbletonSampleManager(QMainWindow):
         # Obtener carpeta base
         base_folder = self.batch_path.text()
         
-        # Crear la carpeta
-        new_folder_path = os.path.join(base_folder, folder_name)
-        try:
-            os.makedirs(new_folder_path, exist_ok=True)
-            self.log_status(f"Carpeta creada: {folder_name}")
-        except Exception as e:
-            self.log_status(f"Error al crear carpeta: {str(e)}", logging.ERROR)
-            QMessageBox.warning(self, "Error", f"No se pudo crear la carpeta: {str(e)}")
+        moves = [(full_path, os.path.join(base_folder, folder_name, filename))
+                 for filename, full_path in selected_files]
+        self.run_batch("Crear carpeta", f"Crear carpeta {folder_name} con los seleccionados", moves)
+    
+    def run_batch(self, title, description, moves):
+        """Valida un lote de (origen, destino), lo muestra y lo ejecuta en segundo plano con diario
+
+        Si un archivo falla, el lote entero se deshace.
+        """
+        plan = plan_batch(moves)
+        if not plan.moves and not plan.conflicts:
+            self.log_status("No hay archivos que cambiar")
+            return
+        dialog = BatchPreviewDialog(title, plan, self.batch_path.text(), self)
+        if dialog.exec_() != QDialog.Accepted:
             return
         
-        # Mostrar diálogo de progreso
-        progress = QProgressDialog("Moviendo archivos...", "Cancelar", 0, len(selected_items), self)
-        progress.setWindowTitle("Moviendo archivos")
-        progress.setWindowModality(Qt.WindowModal)
-        progress.show()
-        
-        # Mover cada archivo
-        moved_count = 0
-        for i, item in enumerate(selected_items):
-            progress.setValue(i)
-            
-            full_path = item.data(0, Qt.UserRole)
-            filename = item.text(0)
-            
-            # Ruta destino
-            dest_path = os.path.join(new_folder_path, filename)
-            
-            # Mover
-            try:
-                shutil.move(full_path, dest_path)
-                moved_count += 1
-            except Exception as e:
-                self.log_status(f"Error al mover {filename}: {str(e)}", logging.ERROR)
-        
-        # Completar
-        progress.setValue(len(selected_items))
-        self.log_status(f"Movidos {moved_count} archivos a {folder_name}")
+        description = f"{description} ({len(plan.moves)} archivos)"
+        # El diario se escribe al empezar: si el lote falla a medias se puede deshacer
+        self.batch_undo_button.setEnabled(True)
+        self.run_task(title, "Procesando archivos...",
+                      lambda journal_path: self.on_batch_finished(description),
+                      execute_batch, plan, description)
+    
+    def on_batch_finished(self, description):
+        self.log_status(f"Lote completado: {description}")
+        self.batch_undo_button.setEnabled(True)
+        self.apply_batch_filters()
+    
+    def undo_last_batch(self):
+        """Deshace el último lote de renombrados o movimientos"""
+        last_batch = last_batch_journal()
+        if last_batch is None:
+            self.batch_undo_button.setEnabled(False)
+            QMessageBox.information(self, "Deshacer último lote", "No hay lotes que deshacer.")
+            return
         
-        # Actualizar vista
+        journal_path, journal = last_batch
+        reply = QMessageBox.question(self, "Deshacer último lote",
+                                     f"¿Deshacer \"{journal['description']}\" ({journal['created']})?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        self.run_task("Deshacer último lote", "Restaurando archivos...",
+                      self.on_batch_undone, rollback_batch, journal_path)
+    
+    def on_batch_undone(self, result):
+        restored, errors = result
+        self.log_status(f"Lote deshecho: {restored} archivos restaurados")
+        if errors:
+            details = "\n".join(f"{path}: {error}" for path, error in errors[:10])
+            QMessageBox.warning(self, "Deshacer último lote",
+                                f"No se pudieron restaurar {len(errors)} archivos:\n{details}")
+        self.batch_undo_button.setEnabled(last_batch_journal() is not None)
         self.apply_batch_filters()
 
     # Métodos utilitarios
-    def format_size(self, size_bytes):
-        """Formatea un tamaño en bytes a formato legible"""
-        if size_bytes < 1024:
-            return f"{size_bytes} B"
-        elif size_bytes < 1024 * 1024:
-            return f"{size_bytes / 1024:.1f} KB"
-        elif size_bytes < 1024 * 1024 * 1024:
-            return f"{size_bytes / (1024 * 1024):.1f} MB"
-        else:
-            return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
-
     def get_modification_date(self, path):
         """Obtiene la fecha de modificación de un archivo o carpeta"""
         try:
@@ -1923,13 +2701,14 @@ class AbletonSampleManager(QMainWindow):
 
     # Métodos de limpieza
     def closeEvent(self, event):
-        """Limpia los archivos temporales al cerrar la aplicación"""
-        if hasattr(self, 'temp_dir') and os.path.exists(self.temp_dir):
-            try:
-                shutil.rmtree(self.temp_dir)
-                self.log_status("Archivos temporales eliminados", logging.INFO)
-            except Exception as e:
-                self.log_status(f"Error al eliminar archivos temporales: {str(e)}", logging.ERROR)
+        """Detiene las tareas en segundo plano al cerrar la aplicación"""
+        # Detener una carga en curso antes de cerrar
+        if self.loader_thread is not None and self.loader_thread.isRunning():
+            self.loader_thread.requestInterruption()
+            self.loader_thread.wait()
+        for task in list(self.tasks):
+            task.requestInterruption()
+            task.wait()
         
         event.accept()
 
@@ -1939,4 +2718,6 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = AbletonSampleManager()
     window.show()
+    # Medir cuando el bucle de eventos ya ha pintado la ventana
+    QTimer.singleShot(0, window.log_startup_time)
     sys.exit(app.exec_())
\ No newline at end of file
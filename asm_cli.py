@@ -0,0 +1,280 @@
+"""Línea de comandos del gestor de samples, sin interfaz gráfica ni Qt
+
+Uso:
+    python -m asm_cli scan proyecto.als [proyecto2.als ...] [--light] [--json]
+    python -m asm_cli usage carpeta_raiz [sample ...] [--json]
+    python -m asm_cli rename proyecto.als sample nuevo_nombre
+    python -m asm_cli move proyecto.als sample [sample ...] --to carpeta
+    python -m asm_cli relink proyecto.als --library carpeta [--library carpeta2 ...] [--dry-run]
+    python -m asm_cli collect proyecto.als [--dry-run]
+    python -m asm_cli unused proyecto.als [--json] [--archive carpeta]
+
+Códigos de salida: 0 correcto, 1 error, 2 hay samples faltantes (scan con
+--fail-on-missing, o relink si quedan samples sin reubicar).
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import logging
+
+from asm_core import (AbletonProject, scan_projects, format_size, build_library_index, plan_relink,
+                      plan_collect, collect_files, archive_files, PROJECT_SCAN_WORKERS)
+
+logger = logging.getLogger('AbletonSampleManager')
+
+def project_report(project):
+    """Resume el estado de los samples de un proyecto cargado"""
+    project_folder = os.path.normcase(os.path.abspath(project.project_folder)) + os.sep
+    missing = sorted({s.relative_path for s in project.samples if not s.exists})
+    external = sorted({s.absolute_path for s in project.samples
+                       if not os.path.normcase(s.absolute_path).startswith(project_folder)})
+    return {
+        'project': project.als_path,
+        'samples': len(project.samples),
+        'files': len(project.sample_index.by_path),
+        'physical_files': len(project.physical_files),
+        'folders': len(project.folder_structure),
+        'missing': missing,
+        'external': external,
+        'duplicate_names': project.duplicate_index.duplicate_groups,
+        'size': sum(group[0].size for group in project.sample_index.by_path.values()),
+    }
+
+def print_report(report):
+    print(report['project'])
+    print(f"  Samples: {report['samples']} referencias, {report['files']} archivos ({format_size(report['size'])})")
+    print(f"  Carpeta: {report['physical_files']} archivos de audio en {report['folders']} carpetas")
+    print(f"  Nombres duplicados: {report['duplicate_names']}")
+    print(f"  Externos: {len(report['external'])}")
+    for path in report['external']:
+        print(f"    {path}")
+    print(f"  Faltantes: {len(report['missing'])}")
+    for path in report['missing']:
+        print(f"    {path}")
+
+def load_project(als_path, light_scan=False):
+    project = AbletonProject(os.path.abspath(als_path))
+    start = time.perf_counter()
+    project.load(light_scan=light_scan)
+    logger.debug(f"{als_path} cargado en {time.perf_counter() - start:.2f} s")
+    return project
+
+def find_sample(project, spec):
+    """Devuelve un sample por ruta relativa, ruta absoluta o nombre; debe ser único"""
+    matches = {}
+    for sample in project.samples:
+        if spec in (sample.relative_path, sample.absolute_path, sample.name):
+            matches.setdefault(sample.absolute_path, sample)
+    if not matches:
+        raise LookupError(f"Sample no encontrado en el proyecto: {spec}")
+    if len(matches) > 1:
+        raise LookupError(f"'{spec}' es ambiguo ({len(matches)} archivos); use la ruta relativa")
+    return next(iter(matches.values()))
+
+def cmd_scan(args):
+    status = 0
+    reports = []
+    for als_path in args.projects:
+        try:
+            report = project_report(load_project(als_path, args.light))
+        except Exception as e:
+            logger.error(f"Error al cargar {als_path}: {str(e)}")
+            status = 1
+            continue
+        reports.append(report)
+        if args.fail_on_missing and report['missing'] and status == 0:
+            status = 2
+        if not args.json:
+            print_report(report)
+    if args.json:
+        json.dump(reports, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    return status
+
+def cmd_usage(args):
+    start = time.perf_counter()
+    index = scan_projects(args.root, workers=args.workers)
+    logger.info(f"{len(index.projects)} proyectos indexados en {time.perf_counter() - start:.1f} s"
+                + (f", {len(index.errors)} con errores" if index.errors else ""))
+
+    if args.samples:
+        usage = {path: index.projects_using(os.path.abspath(path)) for path in args.samples}
+    else:
+        # Sin samples concretos: todos, de más a menos usados
+        usage = {index.sample_paths[key]: projects for key, projects in
+                 sorted(index.by_sample.items(), key=lambda item: -len(item[1]))}
+
+    if args.json:
+        json.dump(usage, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        for path, projects in usage.items():
+            print(f"{path} ({len(projects)} proyectos)")
+            for als_path in projects:
+                print(f"    {als_path}")
+    return 1 if index.errors else 0
+
+def save_project(project, backup):
+    mode = project.save(backup=backup)
+    if mode:
+        print(f"Guardado {project.als_path} ({'parche' if mode == 'patch' else 'completo'})")
+
+def cmd_rename(args):
+    project = load_project(args.project, light_scan=True)
+    sample = find_sample(project, args.sample)
+    old_name = sample.name
+    project.rename_sample(sample, args.new_name)
+    print(f"Archivo renombrado: {old_name} -> {args.new_name}")
+    save_project(project, not args.no_backup)
+    return 0
+
+def cmd_move(args):
+    project = load_project(args.project, light_scan=True)
+    status = 0
+    for spec in args.samples:
+        try:
+            sample = find_sample(project, spec)
+            project.move_sample(sample, args.to)
+            print(f"Movido: {spec} -> {sample.relative_path}")
+        except (LookupError, OSError) as e:
+            logger.error(str(e))
+            status = 1
+    save_project(project, not args.no_backup)
+    return status
+
+def cmd_relink(args):
+    project = load_project(args.project, light_scan=True)
+    start = time.perf_counter()
+    library_index = build_library_index(args.library)
+    logger.info(f"{library_index.file_count} archivos de audio indexados en {time.perf_counter() - start:.1f} s")
+
+    unresolved = 0
+    for sample, candidates, chosen in plan_relink(project.samples, library_index):
+        if chosen is None:
+            unresolved += 1
+            print(f"Sin reubicar: {sample.relative_path} ({len(candidates)} candidatos)")
+            for path, size in candidates:
+                print(f"    {path} ({format_size(size)})")
+            continue
+        print(f"Reubicado: {sample.relative_path} -> {chosen[0]}")
+        if not args.dry_run:
+            project.relink_sample(sample, *chosen)
+
+    if not args.dry_run:
+        save_project(project, not args.no_backup)
+    return 2 if unresolved else 0
+
+def cmd_collect(args):
+    project = load_project(args.project, light_scan=True)
+    plan = plan_collect(project.external_samples(), project.project_folder)
+    if args.dry_run:
+        for sample, destination, reuse in plan:
+            print(f"{'Ya copiado' if reuse else 'Copiar'}: {sample.absolute_path} -> {destination}")
+        return 0
+
+    start = time.perf_counter()
+    collected, errors = collect_files(plan)
+    copied = [entry for entry in collected if not entry[2]]
+    logger.info(f"{len(copied)} archivos copiados ({format_size(sum(e[0].size for e in copied))}) "
+                f"en {time.perf_counter() - start:.1f} s, {len(collected) - len(copied)} ya estaban en el proyecto")
+    for sample, destination, reuse in collected:
+        project.relink_sample(sample, destination, sample.size)
+    save_project(project, not args.no_backup)
+    return 1 if errors else 0
+
+def cmd_unused(args):
+    project = load_project(args.project, light_scan=True)
+    report = project.find_unused_audio()
+    if args.json:
+        json.dump({
+            'projects': report.projects,
+            'presets': report.presets,
+            'size': report.total_size,
+            'folders': [{'folder': folder, 'files': count, 'size': size}
+                        for folder, count, size in report.folder_sizes()],
+            'files': [f.path for f in report.files],
+        }, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        print(f"{len(report.files)} archivos sin usar ({format_size(report.total_size)}) "
+              f"según {len(report.projects)} proyectos y {len(report.presets)} presets")
+        for folder, count, size in report.folder_sizes():
+            print(f"  {folder or '/'}: {count} archivos, {format_size(size)}")
+            if args.verbose:
+                for f in report.by_folder[folder]:
+                    print(f"    {f.name} ({format_size(f.size)})")
+
+    if not args.archive or not report.files:
+        return 0
+    moved, errors = archive_files([f.path for f in report.files], project.project_folder, args.archive)
+    logger.info(f"{len(moved)} archivos movidos a {args.archive}")
+    return 1 if errors else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="asm_cli", description="Gestor de samples para Ableton Live")
+    parser.add_argument("-v", "--verbose", action="store_true", help="mostrar mensajes de depuración")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scan = subparsers.add_parser("scan", help="informe de samples de uno o varios proyectos")
+    scan.add_argument("projects", nargs="+", help="archivos .als")
+    scan.add_argument("--light", action="store_true", help="escaneo ligero, sin árbol XML")
+    scan.add_argument("--json", action="store_true", help="salida en JSON")
+    scan.add_argument("--fail-on-missing", action="store_true", help="salir con código 2 si faltan samples")
+    scan.set_defaults(func=cmd_scan)
+
+    usage = subparsers.add_parser("usage", help="qué proyectos usan cada sample bajo una carpeta")
+    usage.add_argument("root", help="carpeta raíz de proyectos")
+    usage.add_argument("samples", nargs="*", help="samples a consultar (por defecto, todos)")
+    usage.add_argument("--workers", type=int, default=PROJECT_SCAN_WORKERS, help="procesos en paralelo")
+    usage.add_argument("--json", action="store_true", help="salida en JSON")
+    usage.set_defaults(func=cmd_usage)
+
+    rename = subparsers.add_parser("rename", help="renombrar un sample y guardar el proyecto")
+    rename.add_argument("project", help="archivo .als")
+    rename.add_argument("sample", help="nombre, ruta relativa o absoluta del sample")
+    rename.add_argument("new_name", help="nuevo nombre de archivo")
+    rename.add_argument("--no-backup", action="store_true", help="no crear la copia .backup")
+    rename.set_defaults(func=cmd_rename)
+
+    move = subparsers.add_parser("move", help="mover samples a una carpeta del proyecto y guardar")
+    move.add_argument("project", help="archivo .als")
+    move.add_argument("samples", nargs="+", help="nombres, rutas relativas o absolutas de los samples")
+    move.add_argument("--to", required=True, help="carpeta destino, relativa al proyecto")
+    move.add_argument("--no-backup", action="store_true", help="no crear la copia .backup")
+    move.set_defaults(func=cmd_move)
+
+    relink = subparsers.add_parser("relink", help="buscar los samples faltantes en bibliotecas y guardar")
+    relink.add_argument("project", help="archivo .als")
+    relink.add_argument("--library", action="append", required=True, help="carpeta de biblioteca (repetible)")
+    relink.add_argument("--dry-run", action="store_true", help="mostrar lo que se reubicaría sin guardar")
+    relink.add_argument("--no-backup", action="store_true", help="no crear la copia .backup")
+    relink.set_defaults(func=cmd_relink)
+
+    collect = subparsers.add_parser("collect", help="copiar al proyecto los samples externos y guardar")
+    collect.add_argument("project", help="archivo .als")
+    collect.add_argument("--dry-run", action="store_true", help="mostrar lo que se copiaría sin copiar")
+    collect.add_argument("--no-backup", action="store_true", help="no crear la copia .backup")
+    collect.set_defaults(func=cmd_collect)
+
+    unused = subparsers.add_parser("unused", help="audio de la carpeta del proyecto que ningún .als usa")
+    unused.add_argument("project", help="archivo .als")
+    unused.add_argument("--json", action="store_true", help="salida en JSON")
+    unused.add_argument("--archive", metavar="CARPETA",
+                        help="mover los archivos sin usar a esta carpeta, conservando su ruta relativa")
+    unused.set_defaults(func=cmd_unused)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(levelname)s: %(message)s", stream=sys.stderr)
+    try:
+        return args.func(args)
+    except (LookupError, OSError) as e:
+        logger.error(str(e))
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2241 @@
+"""Núcleo del gestor de samples: lectura, análisis y escritura de proyectos .als
+
+No depende de Qt, así que lo usan tanto la interfaz (app.py) como la línea
+de comandos (asm_cli.py).
+"""
+import sys
+import os
+import re
+import tempfile
+import shutil
+import gzip
+import hashlib
+import html
+import json
+import mmap
+import struct
+import sqlite3
+import stat
+import time
+import logging
+import importlib.util
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from datetime import datetime
+
+# lxml.etree tarda más en importarse que todo lo demás; se importa en el primer
+# uso (ver _etree) y al arrancar solo se comprueba que esté instalado
+if importlib.util.find_spec("lxml") is None:
+    # Mostrar mensaje de que se necesita instalar lxml
+    print("Es necesario instalar la biblioteca lxml. Ejecute: pip install lxml")
+    sys.exit(1)
+
+def _etree():
+    """Devuelve lxml.etree, importándolo la primera vez"""
+    from lxml import etree
+    return etree
+
+def parse_als(als_path):
+    """Descomprime un archivo .als en streaming y lo analiza sin pasar por disco"""
+    etree = _etree()
+    parser = etree.XMLParser(remove_blank_text=True)
+    # lxml lee del flujo gzip por bloques, sin archivo temporal ni subproceso
+    with gzip.open(als_path, 'rb') as f:
+        return etree.parse(f, parser)
+
+# Nivel de compresión al guardar (el mismo que usa gzip por defecto)
+ALS_COMPRESS_LEVEL = 6
+
+@contextmanager
+def _replace_als(als_path):
+    """Abre un .als comprimido temporal junto al proyecto y lo sustituye al terminar
+
+    El original solo se reemplaza, de forma atómica, si el bloque termina sin
+    errores; en caso contrario se descarta el temporal.
+    """
+    folder = os.path.dirname(os.path.abspath(als_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".als.tmp", dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as raw:
+            with gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=ALS_COMPRESS_LEVEL) as f:
+                yield f
+            raw.flush()
+            os.fsync(raw.fileno())
+        
+        # Conservar los permisos del proyecto original
+        if os.path.exists(als_path):
+            shutil.copymode(als_path, temp_path)
+        os.replace(temp_path, als_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def write_als(xml_tree, als_path):
+    """Serializa el árbol XML directamente a un .als comprimido"""
+    with _replace_als(als_path) as f:
+        xml_tree.write(f, encoding="UTF-8", xml_declaration=True, pretty_print=True)
+
+class PatchMismatch(Exception):
+    """El .als no contiene las rutas que se querían parchear"""
+    pass
+
+PATCHABLE_PATH_VALUE = re.compile(rb'(<(RelativePath|Path) Value=")([^"]*)(")')
+PATCH_CHUNK_BYTES = 4 * 1024 * 1024
+
+def collect_path_patches(samples):
+    """Devuelve {etiqueta: {valor original: valor nuevo}} de los samples editados
+
+    Devuelve None si hay que volver a serializar el árbol: referencias en el
+    formato anterior a Live 11, samples reubicados en un archivo de otro tamaño
+    que el anotado o una misma ruta original con dos valores nuevos.
+    """
+    patches = {"RelativePath": {}, "Path": {}}
+    for sample in samples:
+        if sample.relative_path == sample.original_relative_path:
+            continue
+        if sample.legacy_ref:
+            return None
+        if sample.original_size is not None and sample.exists and sample.size != sample.original_size:
+            return None
+        
+        changes = [("RelativePath", sample.original_relative_path, sample.relative_path)]
+        if sample.original_path is not None:
+            changes.append(("Path", sample.original_path, to_als_path(sample.absolute_path)))
+        for tag, old_value, new_value in changes:
+            if patches[tag].setdefault(old_value, new_value) != new_value:
+                return None
+    return patches
+
+def patch_als(als_path, patches):
+    """Reescribe solo los valores RelativePath y Path indicados, sin volver a serializar el XML
+
+    El XML original se descomprime y recomprime en streaming; todo lo que no
+    son esos valores queda idéntico byte a byte. Lanza PatchMismatch (sin tocar
+    el proyecto) si alguna ruta original no aparece en el archivo.
+    """
+    found = set()
+    
+    def replace(match):
+        tag = match.group(2).decode('ascii')
+        value = html.unescape(match.group(3).decode('utf-8'))
+        new_value = patches[tag].get(value)
+        if new_value is None:
+            return match.group(0)
+        found.add((tag, value))
+        return match.group(1) + escape_attribute(new_value).encode('utf-8') + match.group(4)
+    
+    with gzip.open(als_path, 'rb') as f_in, _replace_als(als_path) as f_out:
+        # Procesar por bloques cortados en fin de línea para no partir un elemento
+        tail = b''
+        while True:
+            chunk = f_in.read(PATCH_CHUNK_BYTES)
+            if not chunk:
+                f_out.write(PATCHABLE_PATH_VALUE.sub(replace, tail))
+                break
+            data = tail + chunk
+            cut = data.rfind(b'\n') + 1
+            f_out.write(PATCHABLE_PATH_VALUE.sub(replace, data[:cut]))
+            tail = data[cut:]
+        
+        missing = sum(len(values) for values in patches.values()) - len(found)
+        if missing:
+            raise PatchMismatch(f"{missing} rutas no encontradas en el proyecto")
+
+def escape_attribute(value):
+    """Escapa un valor para escribirlo entre comillas dobles en un atributo XML"""
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+def to_als_path(path):
+    """Convierte una ruta del sistema al formato con '/' que usa Live"""
+    return path.replace(os.sep, '/')
+
+def read_file_ref(file_ref):
+    """Devuelve (RelativePath, Path, formato antiguo, tamaño) de un elemento FileRef
+
+    Antes de Live 11 la ruta relativa era una lista de RelativePathElement
+    (un Dir vacío equivale a '..'), el nombre del archivo iba en Name y el
+    tamaño en SearchHint/FileSize en lugar de OriginalFileSize.
+    """
+    rel_path_elem = file_ref.find("RelativePath")
+    if rel_path_elem is None:
+        return None, None, False, None
+    path_elem = file_ref.find("Path")
+    path = path_elem.get("Value") if path_elem is not None else None
+    
+    size = None
+    for size_elem in (file_ref.find("OriginalFileSize"), file_ref.find("SearchHint/FileSize")):
+        if size_elem is not None and size_elem.get("Value", "").isdigit():
+            size = int(size_elem.get("Value")) or None
+            break
+    
+    if "Value" in rel_path_elem.attrib:
+        return rel_path_elem.get("Value"), path, False, size
+    
+    parts = [elem.get("Dir", "") or ".." for elem in rel_path_elem.iterfind("RelativePathElement")]
+    name_elem = file_ref.find("Name")
+    parts.append(name_elem.get("Value", "") if name_elem is not None else "")
+    return "/".join(parts), path, True, size
+
+def _set_path_elements(parent, dirs):
+    """Sustituye la lista de RelativePathElement de un elemento por la de dirs
+
+    Los elementos existentes se reutilizan con su Id y los nuevos se numeran
+    a continuación, como los escribe Live.
+    """
+    elements = parent.findall("RelativePathElement")
+    for elem in elements[len(dirs):]:
+        parent.remove(elem)
+    for index, directory in enumerate(dirs):
+        value = "" if directory == ".." else directory
+        if index < len(elements):
+            elements[index].set("Dir", value)
+        else:
+            parent.append(parent.makeelement("RelativePathElement", Id=str(index), Dir=value))
+
+class FileRefElements:
+    """Hijos de un FileRef que guardan rutas, localizados una sola vez al cargar
+
+    Además de RelativePath, Live guarda la ruta absoluta (Path), y en formatos
+    anteriores el nombre (Name) y una pista de búsqueda (SearchHint) con la
+    carpeta absoluta y el tamaño. Si alguna queda desfasada, Live busca el
+    archivo al abrir el proyecto, así que update las reescribe todas.
+    """
+    __slots__ = ('element', 'relative_path', 'path', 'name', 'path_hint', 'file_sizes')
+    
+    def __init__(self, file_ref):
+        self.element = file_ref
+        self.relative_path = file_ref.find("RelativePath")
+        self.path = file_ref.find("Path")
+        self.name = file_ref.find("Name")
+        self.path_hint = file_ref.find("SearchHint/PathHint")
+        self.file_sizes = [elem for elem in (file_ref.find("OriginalFileSize"), file_ref.find("SearchHint/FileSize"))
+                           if elem is not None]
+    
+    def update(self, relative_path, absolute_path, size=None):
+        """Reescribe en una pasada todas las rutas del FileRef"""
+        als_path = to_als_path(absolute_path)
+        if self.relative_path is not None:
+            if "Value" in self.relative_path.attrib:
+                self.relative_path.set("Value", relative_path)
+            else:
+                _set_path_elements(self.relative_path, relative_path.split("/")[:-1])
+        if self.path is not None:
+            self.path.set("Value", als_path)
+        if self.name is not None:
+            self.name.set("Value", relative_path.rsplit("/", 1)[-1])
+        if self.path_hint is not None:
+            _set_path_elements(self.path_hint, [d for d in als_path.split("/")[:-1] if d])
+        if size is not None:
+            for elem in self.file_sizes:
+                elem.set("Value", str(size))
+
+def iter_file_refs(als_path):
+    """Recorre en streaming los FileRef de un .als sin construir el árbol completo
+
+    Devuelve tuplas (índice, RelativePath, Path, formato antiguo, tamaño) en
+    orden de documento. Cada elemento se libera en cuanto se ha procesado, así que la
+    memoria es constante.
+    """
+    index = 0
+    depth = 0  # Profundidad dentro de un FileRef
+    with gzip.open(als_path, 'rb') as f:
+        for event, elem in _etree().iterparse(f, events=('start', 'end'), remove_blank_text=True):
+            if event == 'start':
+                if elem.tag == 'FileRef':
+                    depth += 1
+                continue
+            
+            if elem.tag == 'FileRef':
+                depth -= 1
+                yield (index,) + read_file_ref(elem)
+                index += 1
+            elif depth:
+                # Los hijos del FileRef se leen al cerrarlo
+                continue
+            
+            # Liberar el elemento y los hermanos ya procesados
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+# Extensiones de audio reconocidas
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.aiff', '.aif', '.m4a', '.ogg', '.flac')
+
+logger = logging.getLogger('AbletonSampleManager')
+
+class OperationCancelled(Exception):
+    """Se lanza cuando el usuario cancela una operación larga"""
+    pass
+
+def format_size(size_bytes):
+    """Formatea un tamaño en bytes a formato legible"""
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+    elif size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.1f} KB"
+    elif size_bytes < 1024 * 1024 * 1024:
+        return f"{size_bytes / (1024 * 1024):.1f} MB"
+    else:
+        return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
+
+def format_duration(seconds):
+    """Formatea una duración en segundos como m:ss.s"""
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes)}:{seconds:04.1f}"
+
+# Registros compactos: con __slots__ no hay un diccionario por instancia y los
+# nombres y carpetas repetidos se comparten internados
+class FolderEntry:
+    """Carpeta del proyecto"""
+    __slots__ = ('name', 'path', 'rel_path', 'audio_count', 'subfolders', 'parent')
+    
+    def __init__(self, path, rel_path, parent, audio_count=0):
+        self.name = sys.intern(os.path.basename(rel_path) if rel_path else '/')
+        self.path = path
+        self.rel_path = sys.intern(rel_path)
+        self.parent = sys.intern(parent)
+        self.audio_count = audio_count
+        self.subfolders = []
+
+class PhysicalFile:
+    """Archivo de audio encontrado en la carpeta del proyecto
+
+    Las rutas no se guardan: se derivan de la carpeta, compartida por todos sus archivos.
+    """
+    __slots__ = ('folder', 'name', 'size')
+    
+    def __init__(self, folder, name, size):
+        self.folder = folder
+        self.name = name
+        self.size = size
+    
+    @property
+    def path(self):
+        return os.path.join(self.folder.path, self.name)
+    
+    @property
+    def rel_path(self):
+        return os.path.join(self.folder.rel_path, self.name) if self.folder.rel_path else self.name
+
+class SampleRecord:
+    """Sample referenciado por un FileRef del proyecto"""
+    __slots__ = ('name', 'relative_path', 'absolute_path', 'exists', 'size', 'folder',
+                 'file_ref', 'ref_index', 'original_relative_path', 'original_path', 'legacy_ref',
+                 'original_size', 'audio_info')
+    
+    def __init__(self, relative_path, absolute_path, file_ref=None, ref_index=None,
+                 original_path=None, legacy_ref=False, original_size=None):
+        # Valores guardados actualmente en el .als
+        self.original_relative_path = relative_path
+        self.original_path = original_path
+        self.legacy_ref = legacy_ref  # FileRef en formato anterior a Live 11
+        self.original_size = original_size  # Tamaño que Live anotó para el archivo
+        self.exists = False
+        self.size = 0
+        self.file_ref = file_ref  # FileRefElements (None en escaneo ligero)
+        self.ref_index = ref_index  # Posición del FileRef en el documento (escaneo ligero)
+        self.audio_info = None  # AudioInfo leído de la cabecera del archivo
+        self.set_location(relative_path, absolute_path)
+    
+    def set_location(self, relative_path, absolute_path):
+        """Cambia la ubicación del sample; el nombre y la carpeta salen de la ruta relativa"""
+        self.relative_path = relative_path
+        self.absolute_path = absolute_path
+        self.name = sys.intern(os.path.basename(relative_path))
+        self.folder = sys.intern(os.path.dirname(relative_path))
+
+# Carpeta para las cachés persistentes
+CACHE_DIR = os.path.join(os.path.expanduser("~"), "AbletonSampleManager_cache")
+
+class SqliteCache:
+    """Base de las cachés persistentes en SQLite bajo CACHE_DIR
+
+    Se usa como context manager; si la base de datos no se puede abrir,
+    devuelve None y quien la usa trabaja sin caché.
+    """
+    DB_NAME = None
+    SCHEMA = None
+    DESCRIPTION = None
+    
+    # Un mtime más reciente que este margen puede cambiar sin que se note
+    RECENT_MTIME_NS = 2 * 10**9
+    
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(CACHE_DIR, self.DB_NAME)
+        self.connection = None
+    
+    def __enter__(self):
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self.connection = sqlite3.connect(self.db_path)
+            self.connection.execute(self.SCHEMA)
+            return self
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"No se pudo abrir la caché de {self.DESCRIPTION}: {str(e)}")
+            self.connection = None
+            return None
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+        return False
+
+class ScanCache(SqliteCache):
+    """Caché persistente de los listados de carpetas
+
+    Cada carpeta guarda sus subcarpetas y archivos de audio (con tamaño) junto
+    al mtime que tenía al listarse; mientras el mtime no cambie, el listado se
+    reutiliza sin volver a leer la carpeta. Los cambios de tamaño de un archivo
+    reescrito en su sitio no alteran el mtime de la carpeta y no se detectan.
+    """
+    DB_NAME = "scan_cache.sqlite"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            subdirs TEXT NOT NULL,
+            files TEXT NOT NULL
+        )"""
+    DESCRIPTION = "escaneo"
+    
+    def get(self, path, mtime_ns):
+        """Devuelve (subcarpetas, archivos) si la carpeta no ha cambiado, o None"""
+        if time.time_ns() - mtime_ns < self.RECENT_MTIME_NS:
+            return None
+        row = self.connection.execute("SELECT mtime_ns, subdirs, files FROM dirs WHERE path = ?",
+                                      (path,)).fetchone()
+        if row is None or row[0] != mtime_ns:
+            return None
+        return json.loads(row[1]), json.loads(row[2])
+    
+    def put(self, path, mtime_ns, subdirs, files):
+        """Guarda el listado de una carpeta"""
+        self.connection.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                                (path, mtime_ns, json.dumps(subdirs), json.dumps(files)))
+    
+    def prune(self, root, seen_paths):
+        """Elimina las carpetas de root que ya no existen"""
+        prefix = os.path.join(root, '')
+        rows = self.connection.execute("SELECT path FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                                       (root, prefix, prefix + '\uffff')).fetchall()
+        stale = [(path,) for (path,) in rows if path not in seen_paths]
+        self.connection.executemany("DELETE FROM dirs WHERE path = ?", stale)
+
+def _list_directory(path):
+    """Lista una carpeta: nombres de subcarpetas y archivos de audio con su tamaño"""
+    subdirs = []
+    files = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                # Igual que os.walk, no se entra en enlaces simbólicos a carpetas
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file():
+                    files.append((entry.name, entry.stat().st_size))
+            except OSError as e:
+                logger.warning(f"No se pudo leer {entry.path}: {str(e)}")
+    return subdirs, files
+
+def walk_project_folder(project_folder, check_cancel=None, cache=None):
+    """Recorre la carpeta del proyecto una sola vez con os.scandir
+
+    Devuelve (physical_files, folder_structure). El tamaño de cada archivo sale
+    del stat del propio DirEntry, sin una llamada a getsize por archivo. Con una
+    ScanCache, las carpetas cuyo mtime no ha cambiado no se vuelven a listar.
+    """
+    physical_files = []
+    folder_structure = {}
+    pending = [(project_folder, '')]
+    
+    while pending:
+        if check_cancel:
+            check_cancel()
+        path, rel_path = pending.pop()
+        parent_path = os.path.dirname(rel_path)
+        
+        try:
+            if cache is not None:
+                # Leer el mtime antes de listar para no dar por buenos cambios simultáneos
+                mtime_ns = os.stat(path).st_mtime_ns
+                listing = cache.get(path, mtime_ns)
+                if listing is None:
+                    listing = _list_directory(path)
+                    cache.put(path, mtime_ns, *listing)
+            else:
+                listing = _list_directory(path)
+        except OSError as e:
+            logger.warning(f"No se pudo leer la carpeta {path}: {str(e)}")
+            listing = ([], [])
+        subdirs, files = listing
+        
+        folder = FolderEntry(path, rel_path, parent_path, len(files))
+        folder_structure[rel_path] = folder
+        
+        # Añadir como subcarpeta al padre
+        if parent_path in folder_structure and rel_path:
+            folder_structure[parent_path].subfolders.append(rel_path)
+        
+        for name in subdirs:
+            pending.append((os.path.join(path, name), os.path.join(rel_path, name) if rel_path else name))
+        
+        for name, size in files:
+            physical_files.append(PhysicalFile(folder, name, size))
+    
+    if cache is not None:
+        cache.prune(project_folder, {folder.path for folder in folder_structure.values()})
+    
+    return physical_files, folder_structure
+
+def path_key(path):
+    """Normaliza una ruta para usarla como clave de los índices en memoria"""
+    return os.path.normcase(os.path.normpath(path))
+
+# En macOS y Windows los sistemas de archivos habituales no distinguen mayúsculas
+CASE_INSENSITIVE_FS = sys.platform in ('darwin', 'win32')
+
+def batch_key(path):
+    """Clave de una ruta para comparar nombres como lo hace el sistema de archivos"""
+    key = path_key(path)
+    return key.casefold() if CASE_INSENSITIVE_FS else key
+
+def make_sample_entry(project_folder, relative_path, file_ref=None, ref_index=None,
+                      original_path=None, legacy_ref=False, original_size=None):
+    """Construye el registro de un sample a partir de su ruta relativa
+
+    La existencia y el tamaño se resuelven después con resolve_sample_files.
+    """
+    absolute_path = os.path.normpath(os.path.join(project_folder, relative_path))
+    return SampleRecord(relative_path, absolute_path, file_ref, ref_index,
+                        original_path, legacy_ref, original_size)
+
+# Hilos para consultar en paralelo los archivos fuera del proyecto
+STAT_WORKERS = 16
+
+def _stat_file(path):
+    """Devuelve el tamaño de un archivo regular o None si no existe"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size if stat.S_ISREG(st.st_mode) else None
+
+def resolve_sample_files(samples, physical_files, folder_structure, check_cancel=None):
+    """Resuelve existencia y tamaño de los samples con el índice del escaneo físico
+
+    Solo se consulta el sistema de archivos para las rutas que el escaneo no ha
+    cubierto (fuera del proyecto o con extensiones no reconocidas), y se hace
+    en paralelo con un pool de hilos. Las rutas se comparan como el sistema
+    de archivos, así que en macOS y Windows una referencia que solo cambia
+    mayúsculas encuentra su archivo.
+    """
+    file_index = {batch_key(f.path): f.size for f in physical_files}
+    scanned_dirs = {batch_key(folder.path) for folder in folder_structure.values()}
+    
+    pending = defaultdict(list)
+    for sample in samples:
+        key = batch_key(sample.absolute_path)
+        if key in file_index:
+            sample.exists = True
+            sample.size = file_index[key]
+        elif (os.path.dirname(key) in scanned_dirs
+              and key.lower().endswith(AUDIO_EXTENSIONS)):
+            # La carpeta se ha escaneado y el archivo no estaba
+            sample.exists = False
+            sample.size = 0
+        else:
+            pending[sample.absolute_path].append(sample)
+    
+    if not pending:
+        return
+    
+    if check_cancel:
+        check_cancel()
+    with ThreadPoolExecutor(max_workers=min(STAT_WORKERS, len(pending))) as executor:
+        for path, size in zip(pending, executor.map(_stat_file, pending)):
+            for sample in pending[path]:
+                sample.exists = size is not None
+                sample.size = size or 0
+
+class DuplicateIndex:
+    """Índice persistente de samples por nombre en minúsculas
+
+    Se actualiza en cada edición, así que consultar si un nombre está repetido
+    o contar duplicados no recorre la lista de samples.
+    """
+    
+    def __init__(self, samples=()):
+        self.groups = defaultdict(dict)  # Nombre en minúsculas -> {id(sample): sample}
+        self.duplicate_groups = 0  # Nombres con más de un sample
+        self.duplicate_count = 0  # Samples que sobran en esos nombres
+        for sample in samples:
+            self.add(sample)
+    
+    def add(self, sample):
+        """Añade un sample al índice"""
+        group = self.groups[sample.name.lower()]
+        group[id(sample)] = sample
+        if len(group) == 2:
+            self.duplicate_groups += 1
+        if len(group) > 1:
+            self.duplicate_count += 1
+    
+    def remove(self, sample, name=None):
+        """Quita un sample del índice (con su nombre anterior si ha cambiado)"""
+        key = (name if name is not None else sample.name).lower()
+        group = self.groups[key]
+        if group.pop(id(sample), None) is None:
+            return
+        if len(group) >= 1:
+            self.duplicate_count -= 1
+        if len(group) == 1:
+            self.duplicate_groups -= 1
+        if not group:
+            del self.groups[key]
+    
+    def rename(self, sample, old_name):
+        """Actualiza el índice tras cambiar el nombre de un sample"""
+        if old_name.lower() != sample.name.lower():
+            self.remove(sample, old_name)
+            self.add(sample)
+    
+    def is_duplicate(self, lower_name):
+        """Indica si hay más de un sample con ese nombre en minúsculas"""
+        group = self.groups.get(lower_name)
+        return group is not None and len(group) > 1
+
+class SamplePathIndex:
+    """Índice de samples por ruta absoluta normalizada
+
+    Varios FileRef pueden apuntar al mismo archivo, así que cada ruta guarda la
+    lista de samples que la referencian.
+    """
+    
+    def __init__(self, samples=()):
+        self.by_path = defaultdict(list)
+        for sample in samples:
+            self.by_path[path_key(sample.absolute_path)].append(sample)
+    
+    def get(self, path):
+        """Devuelve los samples que referencian una ruta"""
+        return self.by_path.get(path_key(path), [])
+    
+    def move(self, old_path, new_path):
+        """Reasigna los samples de una ruta a su nueva ubicación"""
+        group = self.by_path.pop(path_key(old_path), [])
+        if group:
+            self.by_path[path_key(new_path)].extend(group)
+        return group
+
+# Bytes del principio y del final que se comparan antes de un hash completo
+PARTIAL_HASH_BYTES = 64 * 1024
+HASH_CHUNK_BYTES = 1024 * 1024
+HASH_WORKERS = 8
+
+def _partial_hash(path, size):
+    """Hash del primer y último bloque de un archivo (del archivo entero si es pequeño)"""
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        if size <= 2 * PARTIAL_HASH_BYTES:
+            digest.update(f.read())
+        else:
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+            f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def _full_hash(path, size):
+    """Hash del contenido completo de un archivo"""
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _group_by_hash(executor, groups, hash_function, check_cancel=None, progress_callback=None):
+    """Subdivide grupos de archivos por su hash, calculado en paralelo
+
+    Devuelve los subgrupos con más de un archivo, como tuplas (hash, archivos).
+    """
+    files = [f for group in groups for f in group]
+    futures = [executor.submit(hash_function, f.path, f.size) for f in files]
+    
+    by_hash = defaultdict(list)
+    for done, (f, future) in enumerate(zip(files, futures), 1):
+        if check_cancel:
+            check_cancel()
+        try:
+            by_hash[(f.size, future.result())].append(f)
+        except OSError as e:
+            logger.warning(f"No se pudo leer {f.path}: {str(e)}")
+        if progress_callback:
+            progress_callback(done, len(files))
+    return [(key[1], group) for key, group in by_hash.items() if len(group) > 1]
+
+def find_content_duplicates(files, check_cancel=None, progress_callback=None, workers=HASH_WORKERS):
+    """Agrupa los archivos cuyo contenido es idéntico
+
+    Primero agrupa por tamaño, después compara un hash del principio y el final
+    de los archivos del mismo tamaño y solo calcula el hash completo de los que
+    siguen coincidiendo. Devuelve una lista de (hash, archivos), de mayor a
+    menor espacio recuperable.
+    """
+    by_size = defaultdict(list)
+    for f in files:
+        if f.size > 0:
+            by_size[f.size].append(f)
+    candidates = [group for group in by_size.values() if len(group) > 1]
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            partial_groups = _group_by_hash(executor, candidates, _partial_hash, check_cancel, progress_callback)
+            
+            # Los archivos pequeños ya se han leído enteros en el hash parcial
+            duplicates = [(digest, group) for digest, group in partial_groups
+                          if group[0].size <= 2 * PARTIAL_HASH_BYTES]
+            large_groups = [group for digest, group in partial_groups
+                            if group[0].size > 2 * PARTIAL_HASH_BYTES]
+            duplicates.extend(_group_by_hash(executor, large_groups, _full_hash, check_cancel, progress_callback))
+        except OperationCancelled:
+            # Sin esto, la salida del with esperaría a todos los hashes en cola
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    
+    for digest, group in duplicates:
+        group.sort(key=lambda f: f.path)
+    duplicates.sort(key=lambda item: item[1][0].size * (len(item[1]) - 1), reverse=True)
+    return duplicates
+
+# Metadatos de audio leídos solo de las cabeceras, sin decodificar muestras
+AUDIO_INFO_WORKERS = 8
+# Bytes del principio de un MP3 donde se busca la primera trama
+MP3_SYNC_SEARCH_BYTES = 64 * 1024
+# Bytes del final de un Ogg donde se busca la última página
+OGG_TAIL_BYTES = 64 * 1024
+
+class AudioInfo:
+    """Formato, duración, frecuencia, canales y bits de un archivo de audio
+
+    Los campos que la cabecera no indica (bits en MP3 y Ogg, por ejemplo) son None.
+    """
+    __slots__ = ('format', 'duration', 'sample_rate', 'channels', 'bit_depth')
+    
+    def __init__(self, audio_format, duration=None, sample_rate=None, channels=None, bit_depth=None):
+        self.format = audio_format
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bit_depth = bit_depth
+
+def _parse_wav(data):
+    """Recorre los bloques RIFF/RF64 hasta 'fmt ' y 'data'
+
+    Devuelve (orden de bytes, campos de fmt, posición de fmt, posición de
+    los datos, bytes de datos).
+    """
+    riff = data[0:4]
+    if riff not in (b'RIFF', b'RF64', b'RIFX') or data[8:12] != b'WAVE':
+        raise ValueError("No es un WAV")
+    endian = '>' if riff == b'RIFX' else '<'
+    fmt = None
+    fmt_offset = None
+    data_offset = None
+    data_size = None
+    ds64_data_size = None
+    offset = 12
+    while offset + 8 <= len(data) and (fmt is None or data_size is None):
+        chunk_id = data[offset:offset + 4]
+        (chunk_size,) = struct.unpack_from(endian + 'I', data, offset + 4)
+        body = offset + 8
+        if chunk_id == b'ds64':
+            # RF64: los tamaños de más de 4 GB están en este bloque
+            (ds64_data_size,) = struct.unpack_from('<Q', data, body + 8)
+        elif chunk_id == b'fmt ':
+            fmt = struct.unpack_from(endian + 'HHIIHH', data, body)
+            fmt_offset = body
+        elif chunk_id == b'data':
+            if chunk_size == 0xFFFFFFFF and ds64_data_size is not None:
+                chunk_size = ds64_data_size
+            # Las grabaciones interrumpidas dejan el tamaño sin actualizar
+            data_offset = body
+            data_size = min(chunk_size, len(data) - body)
+            if chunk_size == 0xFFFFFFFF:
+                break
+        offset = body + chunk_size + (chunk_size & 1)
+    
+    if fmt is None:
+        raise ValueError("WAV sin bloque fmt")
+    return endian, fmt, fmt_offset, data_offset, data_size
+
+def _read_wav_info(data):
+    """Lee formato y tamaño de datos de un WAV"""
+    _, fmt, _, _, data_size = _parse_wav(data)
+    _, channels, sample_rate, byte_rate, _, bit_depth = fmt
+    duration = data_size / byte_rate if data_size is not None and byte_rate else None
+    return AudioInfo("WAV", duration, sample_rate, channels, bit_depth)
+
+def _extended_to_float(exponent, mantissa):
+    """Convierte un número de coma flotante extendido de 80 bits (frecuencia de AIFF)"""
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+def _parse_aiff(data, need_sound=False):
+    """Recorre los bloques de un AIFF o AIFF-C hasta COMM (y SSND si need_sound)
+
+    Devuelve (canales, frames, bits, frecuencia, compresión, posición de los
+    datos o None).
+    """
+    if data[0:4] != b'FORM' or data[8:12] not in (b'AIFF', b'AIFC'):
+        raise ValueError("No es un AIFF")
+    comm = None
+    sound_offset = None
+    offset = 12
+    while offset + 8 <= len(data) and (comm is None or (need_sound and sound_offset is None)):
+        chunk_id = data[offset:offset + 4]
+        (chunk_size,) = struct.unpack_from('>I', data, offset + 4)
+        if chunk_id == b'COMM':
+            channels, frames, bit_depth = struct.unpack_from('>hIh', data, offset + 8)
+            sample_rate = _extended_to_float(*struct.unpack_from('>HQ', data, offset + 16))
+            # AIFF-C indica la codificación tras la frecuencia; AIFF es siempre PCM big-endian
+            compression = data[offset + 26:offset + 30] if data[8:12] == b'AIFC' else b'NONE'
+            comm = (channels, frames, bit_depth, sample_rate, compression)
+        elif chunk_id == b'SSND':
+            (block_offset,) = struct.unpack_from('>I', data, offset + 8)
+            sound_offset = offset + 16 + block_offset
+        offset += 8 + chunk_size + (chunk_size & 1)
+    if comm is None:
+        raise ValueError("AIFF sin bloque COMM")
+    return comm + (sound_offset,)
+
+def _read_aiff_info(data):
+    """Lee el bloque COMM de un AIFF o AIFF-C"""
+    channels, frames, bit_depth, sample_rate, _, _ = _parse_aiff(data)
+    duration = frames / sample_rate if sample_rate else None
+    return AudioInfo("AIFF", duration, round(sample_rate), channels, bit_depth)
+
+def _id3v2_size(data):
+    """Tamaño de la etiqueta ID3v2 al principio del archivo (0 si no hay)"""
+    if data[0:3] != b'ID3' or len(data) < 10:
+        return 0
+    size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+    return 10 + size + (10 if data[5] & 0x10 else 0)
+
+def _parse_streaminfo(data, offset):
+    """Devuelve (frecuencia, canales, bits, muestras totales) de un bloque STREAMINFO de FLAC"""
+    if len(data) < offset + 18:
+        raise ValueError("STREAMINFO incompleto")
+    packed = int.from_bytes(data[offset + 10:offset + 18], 'big')
+    return packed >> 44, ((packed >> 41) & 0x7) + 1, ((packed >> 36) & 0x1F) + 1, packed & 0xFFFFFFFFF
+
+def _read_flac_info(data):
+    """Lee el bloque STREAMINFO, que siempre es el primero"""
+    start = _id3v2_size(data)
+    if data[start:start + 4] != b'fLaC' or data[start + 4] & 0x7F != 0:
+        raise ValueError("No es un FLAC")
+    sample_rate, channels, bit_depth, total_samples = _parse_streaminfo(data, start + 8)
+    duration = total_samples / sample_rate if sample_rate and total_samples else None
+    return AudioInfo("FLAC", duration, sample_rate, channels, bit_depth)
+
+# Tablas de la cabecera de trama MP3: kbps por (MPEG-1, capa) y Hz por versión
+MP3_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+def _parse_mp3_header(data, offset):
+    """Devuelve (kbps, frecuencia, canales, muestras por trama, bytes de trama) o None"""
+    if offset + 4 > len(data):
+        return None
+    (header,) = struct.unpack_from('>I', data, offset)
+    version = (header >> 19) & 0x3
+    layer = 4 - ((header >> 17) & 0x3)
+    bitrate_index = (header >> 12) & 0xF
+    rate_index = (header >> 10) & 0x3
+    if (header >> 21) != 0x7FF or version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[(mpeg1, layer)][bitrate_index]
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    channels = 1 if (header >> 6) & 0x3 == 3 else 2
+    samples_per_frame = 384 if layer == 1 else (1152 if layer == 2 or mpeg1 else 576)
+    padding = (header >> 9) & 0x1
+    if layer == 1:
+        frame_length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        frame_length = samples_per_frame // 8 * bitrate * 1000 // sample_rate + padding
+    return bitrate, sample_rate, channels, samples_per_frame, frame_length
+
+def _read_mp3_info(data):
+    """Lee la primera trama y, si la hay, la cabecera Xing/Info o VBRI con el número de tramas
+
+    Sin cabecera VBR la duración se estima como en un archivo de bitrate constante.
+    """
+    start = _id3v2_size(data)
+    frame = None
+    offset = data.find(b'\xff', start, start + MP3_SYNC_SEARCH_BYTES)
+    while offset >= 0:
+        frame = _parse_mp3_header(data, offset)
+        # Confirmar la sincronía con la trama siguiente para descartar falsos positivos
+        if frame and (offset + frame[4] >= len(data) or _parse_mp3_header(data, offset + frame[4])):
+            break
+        frame = None
+        offset = data.find(b'\xff', offset + 1, start + MP3_SYNC_SEARCH_BYTES)
+    if frame is None:
+        raise ValueError("No se encontró ninguna trama MP3")
+    bitrate, sample_rate, channels, samples_per_frame, _ = frame
+    
+    # Solo MPEG-1 usa frecuencias de 32 kHz o más
+    mpeg1 = sample_rate >= 32000
+    side_info = (32 if channels == 2 else 17) if mpeg1 else (17 if channels == 2 else 9)
+    xing = offset + 4 + side_info
+    frames = None
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        (flags,) = struct.unpack_from('>I', data, xing + 4)
+        if flags & 0x1:
+            (frames,) = struct.unpack_from('>I', data, xing + 8)
+    elif data[offset + 36:offset + 40] == b'VBRI':
+        (frames,) = struct.unpack_from('>I', data, offset + 50)
+    
+    if frames:
+        duration = frames * samples_per_frame / sample_rate
+    else:
+        audio_bytes = len(data) - offset - (128 if data[-128:-125] == b'TAG' else 0)
+        duration = audio_bytes * 8 / (bitrate * 1000)
+    return AudioInfo("MP3", duration, sample_rate, channels)
+
+def _read_ogg_info(data):
+    """Lee la cabecera de identificación del primer paquete y la posición de la última página"""
+    if data[0:4] != b'OggS' or len(data) < 28:
+        raise ValueError("No es un Ogg")
+    packet = 27 + data[26]
+    pre_skip = 0
+    bit_depth = None
+    if data[packet:packet + 7] == b'\x01vorbis':
+        audio_format = "Vorbis"
+        channels = data[packet + 11]
+        (sample_rate,) = struct.unpack_from('<I', data, packet + 12)
+        granule_rate = sample_rate
+    elif data[packet:packet + 8] == b'OpusHead':
+        # Opus siempre cuenta muestras a 48 kHz; la frecuencia anotada es la de la fuente
+        audio_format = "Opus"
+        channels = data[packet + 9]
+        pre_skip, sample_rate = struct.unpack_from('<HI', data, packet + 10)
+        sample_rate = sample_rate or 48000
+        granule_rate = 48000
+    elif data[packet:packet + 5] == b'\x7fFLAC':
+        audio_format = "FLAC"
+        sample_rate, channels, bit_depth, _ = _parse_streaminfo(data, packet + 17)
+        granule_rate = sample_rate
+    else:
+        raise ValueError("Códec Ogg no reconocido")
+    
+    # La posición granular de la última página completa es el total de muestras
+    duration = None
+    tail = max(0, len(data) - OGG_TAIL_BYTES)
+    page = data.rfind(b'OggS', tail)
+    while page >= 0 and duration is None:
+        (granule,) = struct.unpack_from('<q', data, page + 6)
+        if granule >= 0 and granule_rate:
+            duration = max(granule - pre_skip, 0) / granule_rate
+        page = data.rfind(b'OggS', tail, page)
+    return AudioInfo(audio_format, duration, sample_rate, channels, bit_depth)
+
+AUDIO_INFO_READERS = {
+    '.wav': _read_wav_info,
+    '.aif': _read_aiff_info,
+    '.aiff': _read_aiff_info,
+    '.flac': _read_flac_info,
+    '.mp3': _read_mp3_info,
+    '.ogg': _read_ogg_info,
+}
+
+def read_audio_info(path):
+    """Lee los metadatos de la cabecera de un archivo de audio
+
+    El archivo se proyecta en memoria, así que solo se leen del disco las
+    páginas que tocan las cabeceras. Devuelve None si el formato no se
+    reconoce o la cabecera no es válida.
+    """
+    reader = AUDIO_INFO_READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        return None
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return reader(data)
+    except (OSError, ValueError, struct.error, IndexError) as e:
+        logger.debug(f"No se pudo leer la cabecera de {path}: {str(e)}")
+        return None
+
+class AudioInfoCache(SqliteCache):
+    """Caché persistente de metadatos de audio por archivo, válida mientras no cambien tamaño y mtime"""
+    DB_NAME = "audio_info.sqlite"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS audio_info (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            format TEXT,
+            duration REAL,
+            sample_rate INTEGER,
+            channels INTEGER,
+            bit_depth INTEGER
+        )"""
+    DESCRIPTION = "metadatos de audio"
+    
+    def get(self, path, size, mtime_ns):
+        """Devuelve (encontrado, AudioInfo o None si el archivo no se pudo leer)"""
+        if time.time_ns() - mtime_ns < self.RECENT_MTIME_NS:
+            return False, None
+        row = self.connection.execute("SELECT size, mtime_ns, format, duration, sample_rate, channels, bit_depth "
+                                      "FROM audio_info WHERE path = ?", (path,)).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return False, None
+        return True, AudioInfo(*row[2:]) if row[2] is not None else None
+    
+    def put(self, path, size, mtime_ns, info):
+        """Guarda los metadatos de un archivo (None si no se pudo leer)"""
+        values = (info.format, info.duration, info.sample_rate, info.channels, info.bit_depth) if info else (None,) * 5
+        self.connection.execute("INSERT OR REPLACE INTO audio_info VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                (path, size, mtime_ns) + values)
+
+def _stat_size_mtime(path):
+    """Devuelve (tamaño, mtime_ns) de un archivo o None si no existe"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def read_audio_infos(paths, check_cancel=None, progress_callback=None, workers=AUDIO_INFO_WORKERS):
+    """Lee en paralelo los metadatos de varios archivos de audio
+
+    Devuelve {ruta: AudioInfo o None}. Solo se leen las cabeceras de los
+    archivos que no están en la AudioInfoCache o cuyo tamaño o mtime han
+    cambiado desde la última lectura.
+    """
+    paths = list(dict.fromkeys(paths))
+    infos = {}
+    if not paths:
+        return infos
+    
+    with AudioInfoCache() as cache, ThreadPoolExecutor(max_workers=workers) as executor:
+        stats = dict(zip(paths, executor.map(_stat_size_mtime, paths)))
+        pending = []
+        for path, file_stat in stats.items():
+            if file_stat is None:
+                infos[path] = None
+                continue
+            if cache is not None:
+                found, info = cache.get(path, *file_stat)
+                if found:
+                    infos[path] = info
+                    continue
+            pending.append(path)
+        
+        done = len(paths) - len(pending)
+        if progress_callback:
+            progress_callback(done, len(paths))
+        futures = {executor.submit(read_audio_info, path): path for path in pending}
+        try:
+            for future in as_completed(futures):
+                if check_cancel:
+                    check_cancel()
+                path = futures[future]
+                infos[path] = future.result()
+                if cache is not None and time.time_ns() - stats[path][1] >= cache.RECENT_MTIME_NS:
+                    cache.put(path, *stats[path], infos[path])
+                done += 1
+                if progress_callback:
+                    progress_callback(done, len(paths))
+        except OperationCancelled:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return infos
+
+# Resumen de picos para la vista previa de la forma de onda (requiere NumPy)
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+PEAKS_DIR = os.path.join(CACHE_DIR, "peaks")
+PEAKS_MAGIC = b'ASMPEAK1'
+PEAKS_HEADER = struct.Struct('<8sqqIqHH')
+PEAKS_LEVEL = struct.Struct('<II')
+# Frames por punto en cada nivel de zoom, de más fino a más grueso
+PEAK_BIN_FRAMES = (256, 2048, 16384)
+# Frames que se leen de cada vez (múltiplo del nivel más fino)
+PEAK_CHUNK_FRAMES = 256 * 4096
+PEAK_EXTENSIONS = ('.wav', '.aif', '.aiff')
+
+def _numpy():
+    """Devuelve numpy, importándolo la primera vez"""
+    import numpy
+    return numpy
+
+def _pcm_layout(data):
+    """Describe los datos PCM de un WAV o AIFF para proyectarlos con np.memmap
+
+    Devuelve (posición, frames, canales, bytes por muestra, tipo, orden de
+    bytes, frecuencia), con tipo 'i' (entero), 'u' (entero sin signo) o 'f'
+    (coma flotante). Lanza ValueError si los datos están comprimidos.
+    """
+    if data[0:4] == b'FORM':
+        channels, frames, bit_depth, sample_rate, compression, offset = _parse_aiff(data, need_sound=True)
+        kinds = {b'NONE': ('i', '>'), b'twos': ('i', '>'), b'sowt': ('i', '<'),
+                 b'fl32': ('f', '>'), b'FL32': ('f', '>'), b'fl64': ('f', '>'), b'FL64': ('f', '>')}
+        if compression not in kinds or offset is None:
+            raise ValueError(f"AIFF-C no PCM: {compression!r}")
+        kind, order = kinds[compression]
+        width = 8 if compression.lower() == b'fl64' else (4 if kind == 'f' else (bit_depth + 7) // 8)
+        frames = min(frames, (len(data) - offset) // (width * channels))
+        return offset, frames, channels, width, kind, order, round(sample_rate)
+    
+    endian, fmt, fmt_offset, offset, data_size = _parse_wav(data)
+    format_tag, channels, sample_rate, _, block_align, bit_depth = fmt
+    if format_tag == 0xFFFE:
+        # WAVE_FORMAT_EXTENSIBLE: el formato real abre el GUID del subformato
+        (format_tag,) = struct.unpack_from(endian + 'H', data, fmt_offset + 24)
+    if format_tag not in (1, 3) or offset is None or not channels or not block_align:
+        raise ValueError(f"WAV no PCM (formato {format_tag})")
+    width = block_align // channels
+    kind = 'f' if format_tag == 3 else ('u' if width == 1 else 'i')
+    return offset, data_size // block_align, channels, width, kind, endian, sample_rate
+
+class WaveformPeaks:
+    """Resumen mínimo/máximo de una forma de onda a varios niveles de zoom
+
+    levels es una lista de (frames por punto, mínimos, máximos) de más fino a
+    más grueso, con los valores de todos los canales juntos en int16 a fondo
+    de escala.
+    """
+    
+    def __init__(self, sample_rate, frames, channels, levels):
+        self.sample_rate = sample_rate
+        self.frames = frames
+        self.channels = channels
+        self.levels = levels
+    
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate if self.sample_rate else 0
+    
+    def level_for(self, points):
+        """Devuelve el nivel más grueso con al menos points puntos (o el más fino)"""
+        for level in reversed(self.levels):
+            if len(level[1]) >= points:
+                return level
+        return self.levels[0]
+
+def compute_peaks(path, check_cancel=None, progress_callback=None):
+    """Calcula los picos de un WAV o AIFF PCM sobre una vista np.memmap de sus datos
+
+    Los datos se recorren por bloques y en cada uno se toma el mínimo y el
+    máximo de cada grupo de PEAK_BIN_FRAMES[0] frames con reduceat; los
+    niveles más gruesos se obtienen del más fino.
+    """
+    np = _numpy()
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offset, frames, channels, width, kind, order, sample_rate = _pcm_layout(data)
+    
+    base = PEAK_BIN_FRAMES[0]
+    mins = []
+    maxs = []
+    if frames:
+        if width == 3:
+            # 24 bits: no hay dtype nativo; basta con los 16 bits altos de cada
+            # muestra, que se leen sin copiar con una vista int16 de paso 3 bytes
+            raw = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(frames * channels * 3,))
+            samples = np.ndarray((frames, channels), dtype=f"{order}i2", buffer=raw,
+                                 offset=1 if order == '<' else 0, strides=(3 * channels, 3))
+            width = 2
+        else:
+            samples = np.memmap(path, dtype=np.dtype(f"{order}{kind}{width}"), mode='r',
+                                offset=offset, shape=(frames, channels))
+        for start in range(0, frames, PEAK_CHUNK_FRAMES):
+            if check_cancel:
+                check_cancel()
+            # Intercalados, los base frames de todos los canales son consecutivos:
+            # un solo reduceat sobre la vista plana da el mínimo y máximo por punto
+            block = samples[start:start + PEAK_CHUNK_FRAMES].reshape(-1)
+            starts = np.arange(0, len(block), base * channels)
+            mins.append(np.minimum.reduceat(block, starts))
+            maxs.append(np.maximum.reduceat(block, starts))
+            if progress_callback:
+                progress_callback(min(start + PEAK_CHUNK_FRAMES, frames), frames)
+        del samples
+    
+    # Escalar a int16 según el tipo de muestra
+    if kind == 'f':
+        scale, center = 32767.0, 0.0
+    elif kind == 'u':
+        scale, center = 32767.0 / 128, 128.0
+    else:
+        scale, center = 32767.0 / 2 ** (8 * width - 1), 0.0
+    def to_int16(values):
+        values = np.concatenate(values).astype(np.float64) if values else np.zeros(0)
+        return np.clip(np.round((values - center) * scale), -32768, 32767).astype('<i2')
+    
+    levels = [(base, to_int16(mins), to_int16(maxs))]
+    for bin_frames in PEAK_BIN_FRAMES[1:]:
+        factor = bin_frames // levels[-1][0]
+        finer_mins, finer_maxs = levels[-1][1], levels[-1][2]
+        if len(finer_mins):
+            starts = np.arange(0, len(finer_mins), factor)
+            levels.append((bin_frames, np.minimum.reduceat(finer_mins, starts),
+                           np.maximum.reduceat(finer_maxs, starts)))
+        else:
+            levels.append((bin_frames, finer_mins, finer_maxs))
+    return WaveformPeaks(sample_rate, frames, channels, levels)
+
+def _peaks_cache_path(path):
+    """Archivo de picos en caché de un archivo de audio"""
+    digest = hashlib.sha1(path_key(path).encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(PEAKS_DIR, digest + ".peaks")
+
+def _write_peaks(cache_path, size, mtime_ns, peaks):
+    """Guarda los picos en un archivo binario: cabecera, niveles y arrays int16"""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(PEAKS_HEADER.pack(PEAKS_MAGIC, size, mtime_ns, peaks.sample_rate, peaks.frames,
+                                  peaks.channels, len(peaks.levels)))
+        for bin_frames, mins, _ in peaks.levels:
+            f.write(PEAKS_LEVEL.pack(bin_frames, len(mins)))
+        for _, mins, maxs in peaks.levels:
+            f.write(mins.tobytes())
+            f.write(maxs.tobytes())
+    os.replace(temp_path, cache_path)
+
+def _read_peaks(cache_path, size, mtime_ns):
+    """Lee los picos guardados si corresponden al tamaño y mtime del archivo, o devuelve None"""
+    np = _numpy()
+    try:
+        with open(cache_path, 'rb') as f:
+            magic, cached_size, cached_mtime, sample_rate, frames, channels, level_count = \
+                PEAKS_HEADER.unpack(f.read(PEAKS_HEADER.size))
+            if magic != PEAKS_MAGIC or cached_size != size or cached_mtime != mtime_ns:
+                return None
+            shapes = [PEAKS_LEVEL.unpack(f.read(PEAKS_LEVEL.size)) for _ in range(level_count)]
+            levels = []
+            for bin_frames, count in shapes:
+                mins = np.fromfile(f, dtype='<i2', count=count)
+                maxs = np.fromfile(f, dtype='<i2', count=count)
+                if len(maxs) != count:
+                    return None
+                levels.append((bin_frames, mins, maxs))
+    except (OSError, struct.error):
+        return None
+    return WaveformPeaks(sample_rate, frames, channels, levels)
+
+def cached_peaks(path):
+    """Devuelve los picos de un archivo si ya están en caché y siguen siendo válidos"""
+    file_stat = _stat_size_mtime(path)
+    if file_stat is None:
+        return None
+    return _read_peaks(_peaks_cache_path(path), *file_stat)
+
+def load_peaks(path, check_cancel=None, progress_callback=None):
+    """Devuelve los picos de un archivo desde la caché o calculándolos y guardándolos
+
+    Devuelve None si el archivo no es un WAV o AIFF PCM.
+    """
+    file_stat = _stat_size_mtime(path)
+    if file_stat is None:
+        raise FileNotFoundError(f"Archivo no encontrado: {path}")
+    cache_path = _peaks_cache_path(path)
+    peaks = _read_peaks(cache_path, *file_stat)
+    if peaks is not None:
+        return peaks
+    
+    try:
+        peaks = compute_peaks(path, check_cancel, progress_callback)
+    except (ValueError, struct.error) as e:
+        logger.debug(f"No se pueden calcular los picos de {path}: {str(e)}")
+        return None
+    try:
+        _write_peaks(cache_path, *file_stat, peaks)
+    except OSError as e:
+        logger.warning(f"No se pudo guardar la caché de picos: {str(e)}")
+    return peaks
+
+def collect_samples(xml_root, project_folder, check_cancel=None):
+    """Devuelve los samples referenciados por los FileRef de un árbol XML"""
+    samples = []
+    for ref in xml_root.iterfind(".//FileRef"):
+        if check_cancel:
+            check_cancel()
+        try:
+            relative_path, path, legacy_ref, size = read_file_ref(ref)
+            if relative_path is None:
+                logger.error("FileRef sin RelativePath")
+                continue
+            samples.append(make_sample_entry(project_folder, relative_path, FileRefElements(ref),
+                                             original_path=path, legacy_ref=legacy_ref, original_size=size))
+        except Exception as e:
+            logger.error(f"Error al procesar FileRef: {str(e)}")
+    return samples
+
+def collect_samples_streaming(als_path, project_folder, check_cancel=None):
+    """Devuelve los samples de un .als recorriéndolo con iterparse, sin árbol XML"""
+    samples = []
+    for ref_index, relative_path, path, legacy_ref, size in iter_file_refs(als_path):
+        if check_cancel:
+            check_cancel()
+        if relative_path is None:
+            logger.error(f"FileRef {ref_index} sin RelativePath")
+            continue
+        samples.append(make_sample_entry(project_folder, relative_path, ref_index=ref_index,
+                                         original_path=path, legacy_ref=legacy_ref, original_size=size))
+    return samples
+
+# Procesos para indexar proyectos en paralelo
+PROJECT_SCAN_WORKERS = os.cpu_count() or 4
+
+def find_als_files(root, check_cancel=None, extensions=('.als',)):
+    """Busca los proyectos .als (u otras extensiones) bajo root, sin entrar en las carpetas Backup de Live"""
+    als_files = []
+    pending = [root]
+    while pending:
+        if check_cancel:
+            check_cancel()
+        folder = pending.pop()
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name != "Backup" and not entry.name.startswith('.'):
+                            pending.append(entry.path)
+                    elif entry.name.lower().endswith(extensions):
+                        als_files.append(entry.path)
+        except OSError as e:
+            logger.warning(f"No se pudo listar {folder}: {str(e)}")
+    als_files.sort()
+    return als_files
+
+def scan_project_samples(als_path):
+    """Devuelve las rutas absolutas de los samples de un .als
+
+    Se ejecuta en los procesos de scan_projects, así que solo devuelve cadenas.
+    """
+    samples = collect_samples_streaming(als_path, os.path.dirname(als_path))
+    return sorted({sample.absolute_path for sample in samples})
+
+# Presets de instrumentos, efectos y clips: el mismo XML comprimido con FileRef que un .als
+PRESET_EXTENSIONS = ('.adg', '.adv', '.alc')
+
+def scan_preset_samples(preset_path, project_folder):
+    """Devuelve las rutas a las que pueden apuntar los FileRef de un preset
+
+    La RelativePath de un preset puede ser relativa al proyecto o al propio
+    archivo, así que se devuelven las dos resoluciones y la ruta absoluta.
+    """
+    paths = set()
+    preset_folder = os.path.dirname(preset_path)
+    for ref_index, relative_path, path, legacy_ref, size in iter_file_refs(preset_path):
+        if path:
+            paths.add(path)
+        if relative_path:
+            for base in (project_folder, preset_folder):
+                paths.add(os.path.normpath(os.path.join(base, relative_path)))
+    return paths
+
+class SampleUsageIndex:
+    """Índice de qué proyectos usan cada sample, sobre muchos .als a la vez"""
+    
+    def __init__(self):
+        self.projects = {}  # Proyecto -> rutas absolutas de sus samples
+        self.by_sample = defaultdict(list)  # path_key del sample -> proyectos que lo usan
+        self.sample_paths = {}  # path_key del sample -> ruta para mostrar
+        self.errors = {}  # Proyecto -> error al indexarlo
+    
+    def add_project(self, als_path, sample_paths):
+        """Añade los samples de un proyecto al índice"""
+        self.projects[als_path] = sample_paths
+        for path in sample_paths:
+            key = path_key(path)
+            self.by_sample[key].append(als_path)
+            self.sample_paths.setdefault(key, path)
+    
+    def projects_using(self, sample_path):
+        """Devuelve los proyectos que referencian un sample"""
+        return self.by_sample.get(path_key(sample_path), [])
+    
+    def search(self, text, limit=None):
+        """Devuelve (ruta, proyectos) de los samples cuya ruta contiene text"""
+        # Las claves conservan las mayúsculas en POSIX: se comparan ambos lados en minúsculas
+        text = (path_key(text) if os.path.isabs(text) else text).lower()
+        results = []
+        for key, projects in self.by_sample.items():
+            if text in key.lower():
+                results.append((self.sample_paths[key], projects))
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+def scan_projects(root, check_cancel=None, progress_callback=None, workers=PROJECT_SCAN_WORKERS):
+    """Indexa los samples de todos los proyectos bajo root en varios procesos
+
+    Cada proceso descomprime y recorre un .als con iterparse; el proceso
+    principal solo junta las rutas en un SampleUsageIndex.
+    """
+    als_files = find_als_files(root, check_cancel)
+    index = SampleUsageIndex()
+    if not als_files:
+        return index
+    
+    # concurrent.futures.process arrastra multiprocessing: solo se carga al escanear
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # spawn: los procesos no heredan el estado de los hilos del proceso principal
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(als_files)), mp_context=context) as executor:
+        futures = {executor.submit(scan_project_samples, als_path): als_path for als_path in als_files}
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                if check_cancel:
+                    check_cancel()
+                als_path = futures[future]
+                try:
+                    index.add_project(als_path, future.result())
+                except Exception as e:
+                    index.errors[als_path] = str(e)
+                    logger.warning(f"No se pudo indexar {als_path}: {str(e)}")
+                if progress_callback:
+                    progress_callback(done, len(als_files))
+        except OperationCancelled:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return index
+
+# Hilos para recorrer en paralelo las bibliotecas de samples
+LIBRARY_WALK_WORKERS = 16
+
+class LibraryIndex:
+    """Archivos de audio de las bibliotecas de samples, indexados por nombre
+
+    Cada nombre (en minúsculas) guarda la ruta y el tamaño de todos los
+    archivos que lo tienen, para buscar los samples faltantes sin volver a
+    recorrer las bibliotecas.
+    """
+    
+    def __init__(self, roots=()):
+        self.roots = list(roots)
+        self.by_name = defaultdict(list)  # Nombre en minúsculas -> [(ruta, tamaño)]
+        self.file_count = 0
+    
+    def add(self, folder, name, size):
+        self.by_name[name.lower()].append((os.path.join(folder, name), size))
+        self.file_count += 1
+    
+    def candidates(self, name):
+        """Devuelve (ruta, tamaño) de los archivos con ese nombre"""
+        return self.by_name.get(name.lower(), [])
+
+def build_library_index(roots, check_cancel=None, progress_callback=None, workers=LIBRARY_WALK_WORKERS):
+    """Recorre en paralelo las bibliotecas de samples y devuelve un LibraryIndex
+
+    Cada carpeta se lista en un hilo y sus subcarpetas se encolan en cuanto
+    termina, así que varias ramas (y varios discos) avanzan a la vez.
+    """
+    index = LibraryIndex(roots)
+    folders_done = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(_list_directory, root): root for root in roots if os.path.isdir(root)}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                if check_cancel:
+                    check_cancel()
+                for future in done:
+                    folder = pending.pop(future)
+                    try:
+                        subdirs, files = future.result()
+                    except OSError as e:
+                        logger.warning(f"No se pudo listar {folder}: {str(e)}")
+                        continue
+                    for name, size in files:
+                        index.add(folder, name, size)
+                    for name in subdirs:
+                        subfolder = os.path.join(folder, name)
+                        pending[executor.submit(_list_directory, subfolder)] = subfolder
+                    folders_done += 1
+                if progress_callback:
+                    progress_callback(folders_done, folders_done + len(pending))
+        except OperationCancelled:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return index
+
+def _folder_parts(path):
+    """Carpetas de una ruta en minúsculas, de la más cercana al archivo a la raíz"""
+    return [part for part in reversed(re.split(r'[\\/]', path.lower())[:-1]) if part not in ('', '.', '..')]
+
+def choose_relink_candidate(sample, candidates):
+    """Elige el archivo que sustituye a un sample faltante, o None si no está claro
+
+    Si Live anotó el tamaño, solo valen los candidatos con ese tamaño y, entre
+    ellos, los que comparten más carpetas finales con la ruta original
+    (Drums/Kicks/kick.wav). Un empate en cabeza se deja para el usuario.
+    """
+    if sample.original_size is not None:
+        # Un archivo con otro tamaño puede ser otro sample con el mismo nombre
+        candidates = [candidate for candidate in candidates if candidate[1] == sample.original_size]
+    if not candidates:
+        return None
+    if len(candidates) == 1:
+        return candidates[0]
+    
+    wanted = _folder_parts(sample.original_path or sample.relative_path)
+    
+    def similarity(candidate):
+        depth = 0
+        for wanted_part, part in zip(wanted, _folder_parts(candidate[0])):
+            if wanted_part != part:
+                break
+            depth += 1
+        return depth
+    
+    scored = sorted(candidates, key=similarity, reverse=True)
+    if similarity(scored[0]) == similarity(scored[1]):
+        return None
+    return scored[0]
+
+def plan_relink(samples, library_index):
+    """Busca en una pasada candidatos para todos los samples faltantes
+
+    Devuelve una lista de (sample, candidatos, elegido), con un sample por
+    archivo faltante; elegido es (ruta, tamaño) o None si no hay uno claro.
+    """
+    plan = []
+    seen = set()
+    for sample in samples:
+        if sample.exists:
+            continue
+        key = path_key(sample.absolute_path)
+        if key in seen:
+            continue
+        seen.add(key)
+        candidates = library_index.candidates(sample.name)
+        plan.append((sample, candidates, choose_relink_candidate(sample, candidates)))
+    return plan
+
+# Carpeta del proyecto donde se recopilan los samples externos (como hace Live)
+COLLECT_FOLDER = os.path.join("Samples", "Imported")
+COPY_WORKERS = 4
+
+# ioctl de Linux para clonar un archivo (reflink) en btrfs, XFS y similares
+FICLONE = 0x40049409
+
+def _kernel_copy(src_fd, dst_fd, size):
+    """Copia dentro del kernel con reflink o copy_file_range; False si no se puede"""
+    import fcntl
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError:
+        pass
+    
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            count = os.copy_file_range(src_fd, dst_fd, size - copied)
+            if count == 0:
+                break
+            copied += count
+    except OSError:
+        # EXDEV, ENOSYS, EINVAL...: el sistema de archivos no lo admite
+        if copied:
+            raise
+        return False
+    return True
+
+def copy_file_fast(src, dst):
+    """Copia src en dst por la vía más rápida que admita el sistema de archivos
+
+    En Linux prueba un reflink (copia instantánea que comparte bloques) y
+    copy_file_range; si no, shutil.copyfile, que ya usa sendfile en Linux y
+    fcopyfile en macOS. Se copia a un temporal junto al destino y se renombra,
+    así nunca queda un archivo a medias.
+    """
+    temp_path = dst + ".part"
+    try:
+        copied = False
+        if sys.platform.startswith('linux'):
+            with open(src, 'rb') as fsrc, open(temp_path, 'wb') as fdst:
+                copied = _kernel_copy(fsrc.fileno(), fdst.fileno(), os.fstat(fsrc.fileno()).st_size)
+        if not copied:
+            shutil.copyfile(src, temp_path)
+        shutil.copystat(src, temp_path)
+        os.replace(temp_path, dst)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def same_content(path_a, path_b, size):
+    """Compara dos archivos del mismo tamaño por hash, primero parcial y luego completo"""
+    return (_partial_hash(path_a, size) == _partial_hash(path_b, size)
+            and _full_hash(path_a, size) == _full_hash(path_b, size))
+
+def plan_collect(samples, project_folder):
+    """Decide dónde copiar cada archivo externo dentro de COLLECT_FOLDER
+
+    Devuelve una lista de (sample, destino, reutilizar), con un sample por
+    archivo externo. Si el nombre ya está ocupado por un archivo idéntico se
+    reutiliza; si lo ocupa otro archivo se añade un sufijo (kick-1.wav).
+    """
+    target_folder = os.path.join(project_folder, COLLECT_FOLDER)
+    inside = os.path.join(path_key(project_folder), '')
+    plan = []
+    seen = set()
+    taken = set()  # Destinos ya asignados en este plan
+    for sample in samples:
+        key = path_key(sample.absolute_path)
+        if not sample.exists or key.startswith(inside) or key in seen:
+            continue
+        seen.add(key)
+        
+        stem, extension = os.path.splitext(sample.name)
+        suffix = 0
+        while True:
+            destination = os.path.join(target_folder, f"{stem}-{suffix}{extension}" if suffix else sample.name)
+            if path_key(destination) not in taken:
+                if not os.path.exists(destination):
+                    reuse = False
+                    break
+                if (os.path.getsize(destination) == sample.size
+                        and same_content(sample.absolute_path, destination, sample.size)):
+                    reuse = True
+                    break
+            suffix += 1
+        taken.add(path_key(destination))
+        plan.append((sample, destination, reuse))
+    return plan
+
+def collect_files(plan, check_cancel=None, progress_callback=None, workers=COPY_WORKERS):
+    """Copia en paralelo los archivos de un plan de plan_collect
+
+    Devuelve (copiados, errores): las entradas del plan ya disponibles en su
+    destino y una lista de (ruta, error) de las que no se pudieron copiar.
+    """
+    to_copy = [entry for entry in plan if not entry[2]]
+    collected = [entry for entry in plan if entry[2]]
+    errors = []
+    if not to_copy:
+        return collected, errors
+    
+    os.makedirs(os.path.dirname(to_copy[0][1]), exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(copy_file_fast, sample.absolute_path, destination): (sample, destination, reuse)
+                   for sample, destination, reuse in to_copy}
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                if check_cancel:
+                    check_cancel()
+                entry = futures[future]
+                try:
+                    future.result()
+                    collected.append(entry)
+                except OSError as e:
+                    errors.append((entry[0].absolute_path, str(e)))
+                    logger.error(f"No se pudo copiar {entry[0].absolute_path}: {str(e)}")
+                if progress_callback:
+                    progress_callback(done, len(to_copy))
+        except OperationCancelled:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return collected, errors
+
+class UnusedAudioReport:
+    """Archivos de audio de la carpeta del proyecto que ningún .als ni preset referencia"""
+    
+    def __init__(self, files, projects, presets=()):
+        self.files = files  # PhysicalFile sin usar
+        self.projects = projects  # .als cuyas referencias se han tenido en cuenta
+        self.presets = list(presets)  # Presets (.adg, .adv, .alc) cuyas referencias se han tenido en cuenta
+        self.by_folder = defaultdict(list)  # Ruta relativa de la carpeta -> archivos sin usar
+        for f in files:
+            self.by_folder[f.folder.rel_path].append(f)
+    
+    @property
+    def total_size(self):
+        return sum(f.size for f in self.files)
+    
+    def folder_sizes(self):
+        """Devuelve (carpeta, archivos, bytes recuperables), de más a menos bytes"""
+        sizes = [(folder, len(files), sum(f.size for f in files)) for folder, files in self.by_folder.items()]
+        sizes.sort(key=lambda item: (-item[2], item[0]))
+        return sizes
+
+def find_unused_audio(physical_files, referenced_paths):
+    """Diferencia de conjuntos entre los archivos físicos y las rutas referenciadas
+
+    Las rutas se comparan como el sistema de archivos: en macOS y Windows una
+    referencia que solo cambia mayúsculas apunta al mismo archivo.
+    """
+    referenced = {batch_key(path) for path in referenced_paths}
+    return [f for f in physical_files if batch_key(f.path) not in referenced]
+
+def dispose_files(paths, dispose, check_cancel=None, progress_callback=None):
+    """Aplica dispose(ruta) a cada archivo (papelera, archivo...)
+
+    Devuelve (tratados, errores): las rutas procesadas y una lista de
+    (ruta, error) de las que fallaron.
+    """
+    disposed = []
+    errors = []
+    for done, path in enumerate(paths, 1):
+        if check_cancel:
+            check_cancel()
+        try:
+            dispose(path)
+            disposed.append(path)
+        except OSError as e:
+            errors.append((path, str(e)))
+            logger.error(f"No se pudo retirar {path}: {str(e)}")
+        if progress_callback:
+            progress_callback(done, len(paths))
+    return disposed, errors
+
+def archive_files(paths, project_folder, archive_folder, check_cancel=None, progress_callback=None):
+    """Mueve archivos del proyecto a archive_folder conservando su ruta relativa"""
+    def archive(path):
+        destination = os.path.join(archive_folder, os.path.relpath(path, project_folder))
+        if os.path.exists(destination):
+            raise FileExistsError(f"Ya existe en el archivo: {destination}")
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.move(path, destination)
+    return dispose_files(paths, archive, check_cancel, progress_callback)
+
+# Diarios de los lotes de renombrado/movimiento, para deshacer el último
+BATCH_JOURNAL_DIR = os.path.join(CACHE_DIR, "journal")
+BATCH_JOURNAL_KEEP = 20
+
+class BatchPlan:
+    """Lote de renombrados y movimientos validado en memoria antes de tocar el disco
+
+    steps está en orden de ejecución: cada destino se libera antes de
+    ocuparlo y los ciclos (a -> b, b -> a) pasan por un nombre temporal.
+    """
+    
+    def __init__(self):
+        self.moves = []  # (origen, destino) que se van a ejecutar
+        self.conflicts = []  # (origen, destino, motivo) descartados
+        self.steps = []  # (origen, destino) en orden, con los pasos temporales
+        self.directories = []  # Carpetas que hay que crear, cada una detrás de su carpeta padre
+
+def _list_folder_keys(folder):
+    """Claves de todas las entradas de una carpeta con un solo listado, o None si no existe
+
+    Lanza OSError si la carpeta existe pero no se puede listar.
+    """
+    try:
+        with os.scandir(folder) as entries:
+            return {batch_key(entry.path) for entry in entries}
+    except FileNotFoundError:
+        return None
+
+def _temporary_name(path, taken):
+    """Nombre libre junto a path para romper un ciclo de renombrados"""
+    folder, name = os.path.split(path)
+    for counter in range(1, 10000):
+        candidate = os.path.join(folder, f".asm-tmp-{counter}-{name}")
+        if batch_key(candidate) not in taken:
+            taken.add(batch_key(candidate))
+            return candidate
+    raise FileExistsError(f"No hay nombre temporal libre para {path}")
+
+def order_batch_steps(moves, occupied=()):
+    """Ordena los movimientos para que ninguno ocupe un origen aún no movido
+
+    Cada destino es único, así que los movimientos forman cadenas y ciclos:
+    las cadenas se ejecutan desde el final y cada ciclo se abre moviendo uno
+    de sus orígenes a un nombre temporal que no esté en occupied.
+    """
+    pending = {batch_key(src): (src, dst) for src, dst in moves}
+    # Movimiento que espera a que se libere cada ruta
+    waiting = {batch_key(dst): batch_key(src) for src, dst in moves if batch_key(dst) != batch_key(src)}
+    taken = set(occupied) | set(pending) | set(waiting)
+    ready = [key for key, (src, dst) in pending.items() if batch_key(dst) not in pending or batch_key(dst) == key]
+    steps = []
+    while pending:
+        if not ready:
+            # Solo quedan ciclos: apartar un origen y completar su movimiento al final
+            key, (src, dst) = next(iter(pending.items()))
+            temp = _temporary_name(src, taken)
+            steps.append((src, temp))
+            del pending[key]
+            pending[batch_key(temp)] = (temp, dst)
+            waiting[batch_key(dst)] = batch_key(temp)
+            if key in waiting:
+                ready.append(waiting.pop(key))
+            continue
+        key = ready.pop()
+        src, dst = pending.pop(key)
+        steps.append((src, dst))
+        # El origen queda libre para el movimiento que lo tenía como destino
+        follower = waiting.pop(key, None)
+        if follower is not None and follower in pending:
+            ready.append(follower)
+    return steps
+
+def plan_batch(moves):
+    """Valida un lote de (origen, destino) en memoria, sin tocar el disco más que para listar
+
+    Descarta los movimientos sin cambios, los destinos repetidos en el lote y
+    los destinos que ya existen y no se liberan dentro del mismo lote. La
+    existencia se comprueba contra un conjunto con un solo listado por
+    carpeta de destino, no con una consulta por archivo; en macOS y Windows
+    los nombres se comparan sin distinguir mayúsculas. Un movimiento
+    descartado deja su origen ocupado, así que se repite la validación hasta
+    que no cambia nada.
+    """
+    plan = BatchPlan()
+    candidates = {}
+    for src, dst in moves:
+        key = batch_key(src)
+        if key in candidates or src == dst:
+            continue
+        candidates[key] = (src, dst)
+    
+    # Destinos repetidos: gana el primero
+    targets = {}
+    for key, (src, dst) in list(candidates.items()):
+        target = batch_key(dst)
+        if target in targets:
+            plan.conflicts.append((src, dst, f"Destino repetido en el lote: {os.path.basename(dst)}"))
+            del candidates[key]
+        else:
+            targets[target] = key
+    
+    # Entradas existentes en las carpetas de destino y carpetas que hay que crear
+    occupied = set()
+    missing = set()
+    unreadable = {}  # Carpeta -> error al listarla
+    for folder in {os.path.dirname(dst) for _, dst in candidates.values()}:
+        try:
+            keys = _list_folder_keys(folder)
+        except OSError as e:
+            unreadable[folder] = e.strerror or str(e)
+            continue
+        if keys is not None:
+            occupied.update(keys)
+            continue
+        # También las carpetas intermedias que falten, hasta la primera que exista
+        while folder not in missing and not os.path.isdir(folder):
+            missing.add(folder)
+            parent = os.path.dirname(folder)
+            if parent == folder:
+                break
+            folder = parent
+    # Ordenadas, cada carpeta va detrás de su carpeta padre
+    plan.directories = sorted(missing)
+    
+    # Sin listado no se puede saber si el destino está libre
+    for key, (src, dst) in list(candidates.items()):
+        folder = os.path.dirname(dst)
+        if folder in unreadable:
+            reason = f"No se puede leer la carpeta {os.path.basename(folder)}: {unreadable[folder]}"
+            plan.conflicts.append((src, dst, reason))
+            del candidates[key]
+    
+    # Destinos ocupados que no se liberan en el lote; un cambio solo de
+    # mayúsculas tiene la misma clave que su origen y no choca consigo mismo
+    changed = True
+    while changed:
+        changed = False
+        for key, (src, dst) in list(candidates.items()):
+            target = batch_key(dst)
+            if target in occupied and target not in candidates:
+                plan.conflicts.append((src, dst, f"Ya existe: {os.path.basename(dst)}"))
+                del candidates[key]
+                changed = True
+    
+    plan.moves = list(candidates.values())
+    plan.steps = order_batch_steps(plan.moves, occupied)
+    return plan
+
+def _write_journal(journal_path, journal):
+    """Escribe el diario de forma atómica y lo fuerza a disco"""
+    temp_path = journal_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(journal, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, journal_path)
+
+def _undo_steps(steps, created_dirs, check_cancel=None, progress_callback=None):
+    """Deshace en orden inverso los pasos que se llegaron a ejecutar
+
+    El estado se deduce del disco: un paso se hizo si su destino existe y su
+    origen no, así que sirve también para un lote interrumpido.
+    """
+    restored = 0
+    errors = []
+    for done, (src, dst) in enumerate(reversed(steps), 1):
+        if check_cancel:
+            check_cancel()
+        if os.path.lexists(dst) and not os.path.lexists(src):
+            try:
+                shutil.move(dst, src)
+                restored += 1
+            except OSError as e:
+                errors.append((dst, str(e)))
+                logger.error(f"No se pudo restaurar {dst}: {str(e)}")
+        if progress_callback:
+            progress_callback(done, len(steps))
+    # De la más profunda a la de más arriba
+    for folder in reversed(created_dirs):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass  # No está vacía o ya no existe
+    return restored, errors
+
+def execute_batch(plan, description, check_cancel=None, progress_callback=None):
+    """Ejecuta un BatchPlan con un diario escrito antes de empezar
+
+    Si un paso falla o se cancela el lote, se deshacen los pasos hechos y se
+    relanza el error, así que el lote se aplica entero o no se aplica. Si
+    algún paso no se puede deshacer, el diario queda como 'failed' para
+    "Deshacer último lote" y el error incluye los archivos afectados.
+    Devuelve la ruta del diario.
+    """
+    os.makedirs(BATCH_JOURNAL_DIR, exist_ok=True)
+    journal_path = os.path.join(BATCH_JOURNAL_DIR, f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json")
+    journal = {
+        'description': description,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'status': 'pending',
+        'directories': plan.directories,
+        'steps': plan.steps,
+    }
+    _write_journal(journal_path, journal)
+    
+    created_dirs = []
+    try:
+        for folder in plan.directories:
+            os.mkdir(folder)
+            created_dirs.append(folder)
+        for done, (src, dst) in enumerate(plan.steps, 1):
+            if check_cancel:
+                check_cancel()
+            shutil.move(src, dst)
+            if progress_callback:
+                progress_callback(done, len(plan.steps))
+    except (OSError, OperationCancelled) as e:
+        # _undo_steps deduce del disco qué pasos se hicieron
+        restored, errors = _undo_steps(plan.steps, created_dirs)
+        if errors:
+            # El diario queda pendiente para poder deshacer el resto más tarde
+            journal['status'] = 'failed'
+            _write_journal(journal_path, journal)
+            details = "; ".join(f"{path}: {error}" for path, error in errors)
+            raise OSError(f"{e}. No se pudo deshacer el lote por completo: {details}") from e
+        journal['status'] = 'rolled_back'
+        _write_journal(journal_path, journal)
+        raise
+    
+    journal['status'] = 'done'
+    _write_journal(journal_path, journal)
+    _prune_journals()
+    return journal_path
+
+def _prune_journals():
+    """Conserva solo los BATCH_JOURNAL_KEEP diarios más recientes"""
+    journals = sorted(name for name in os.listdir(BATCH_JOURNAL_DIR) if name.endswith('.json'))
+    for name in journals[:-BATCH_JOURNAL_KEEP]:
+        try:
+            os.remove(os.path.join(BATCH_JOURNAL_DIR, name))
+        except OSError:
+            pass
+
+def last_batch_journal():
+    """Devuelve (ruta, diario) del último lote que se puede deshacer, o None"""
+    try:
+        journals = sorted((name for name in os.listdir(BATCH_JOURNAL_DIR) if name.endswith('.json')), reverse=True)
+    except OSError:
+        return None
+    for name in journals:
+        journal_path = os.path.join(BATCH_JOURNAL_DIR, name)
+        try:
+            with open(journal_path, encoding='utf-8') as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if journal.get('status') != 'rolled_back':
+            return journal_path, journal
+    return None
+
+def rollback_batch(journal_path, check_cancel=None, progress_callback=None):
+    """Deshace un lote a partir de su diario; devuelve (restaurados, errores)"""
+    with open(journal_path, encoding='utf-8') as f:
+        journal = json.load(f)
+    restored, errors = _undo_steps([tuple(step) for step in journal['steps']], journal['directories'],
+                                   check_cancel, progress_callback)
+    if not errors:
+        journal['status'] = 'rolled_back'
+        _write_journal(journal_path, journal)
+    return restored, errors
+
+class AbletonProject:
+    """Proyecto .als cargado: samples, archivos físicos e índices, sin interfaz
+
+    Reúne la carga, el renombrado, el movimiento y el guardado que comparten la
+    interfaz gráfica y la línea de comandos.
+    """
+    
+    def __init__(self, als_path=None):
+        self.als_path = als_path
+        self.project_folder = os.path.dirname(als_path) if als_path else None
+        self.xml_tree = None  # Árbol XML (None en escaneo ligero hasta que se edita)
+        self.xml_root = None
+        self.samples = []
+        self.physical_files = []  # Lista de archivos físicos encontrados
+        self.folder_structure = {}  # Estructura de carpetas
+        self.duplicate_index = DuplicateIndex()  # Samples por nombre para detectar duplicados
+        self.sample_index = SamplePathIndex()  # Samples por ruta absoluta
+    
+    def load(self, light_scan=False, check_cancel=None, progress_callback=None):
+        """Carga el proyecto completo: XML (salvo escaneo ligero), carpeta y samples
+
+        progress_callback(porcentaje, etapa) se llama al empezar cada etapa.
+        """
+        if not light_scan:
+            if progress_callback:
+                progress_callback(10, "Descomprimiendo y analizando archivo .als...")
+            self.set_xml_tree(parse_als(self.als_path))
+            if check_cancel:
+                check_cancel()
+        if progress_callback:
+            progress_callback(30, "Escaneando carpeta del proyecto...")
+        self.scan_folder(check_cancel)
+        if progress_callback:
+            progress_callback(50, "Buscando samples en el proyecto...")
+        self.find_samples(check_cancel)
+    
+    def set_xml_tree(self, xml_tree):
+        self.xml_tree = xml_tree
+        self.xml_root = xml_tree.getroot() if xml_tree is not None else None
+    
+    def scan_folder(self, check_cancel=None):
+        """Escanea los archivos físicos y la estructura de carpetas del proyecto"""
+        with ScanCache() as cache:
+            self.physical_files, self.folder_structure = walk_project_folder(self.project_folder, check_cancel, cache)
+    
+    def find_samples(self, check_cancel=None):
+        """Busca los samples referenciados en el proyecto y resuelve sus archivos"""
+        if self.xml_root is not None:
+            self.samples = collect_samples(self.xml_root, self.project_folder, check_cancel)
+        else:
+            self.samples = collect_samples_streaming(self.als_path, self.project_folder, check_cancel)
+        resolve_sample_files(self.samples, self.physical_files, self.folder_structure, check_cancel)
+        self.build_indexes()
+    
+    def build_indexes(self):
+        """Reconstruye los índices de duplicados y de rutas sobre los samples"""
+        self.duplicate_index = DuplicateIndex(self.samples)
+        self.sample_index = SamplePathIndex(self.samples)
+    
+    def ensure_xml_tree(self):
+        """Carga el árbol XML completo bajo demanda tras un escaneo ligero"""
+        if self.xml_tree is not None:
+            return
+        
+        xml_tree = parse_als(self.als_path)
+        # Enlazar cada sample con su FileRef por posición en el documento
+        # y trasladar al XML las ediciones hechas sin árbol
+        file_refs = xml_tree.getroot().findall(".//FileRef")
+        for sample in self.samples:
+            if sample.file_ref is None:
+                sample.file_ref = FileRefElements(file_refs[sample.ref_index])
+                if sample.relative_path != sample.original_relative_path:
+                    sample.file_ref.update(sample.relative_path, sample.absolute_path,
+                                           sample.size if sample.exists else None)
+        self.set_xml_tree(xml_tree)
+    
+    def relocate_sample_file(self, sample, new_abs_path, new_rel_path):
+        """Mueve el archivo de un sample y actualiza todos los FileRef que lo usan
+
+        Lanza FileNotFoundError si el archivo no existe y FileExistsError si el
+        destino ya existe.
+        """
+        old_abs_path = sample.absolute_path
+        if not os.path.isfile(old_abs_path):
+            raise FileNotFoundError(f"Archivo no encontrado: {old_abs_path}")
+        if os.path.exists(new_abs_path):
+            raise FileExistsError(f"Ya existe un archivo con el nombre: {os.path.basename(new_abs_path)}")
+        
+        os.makedirs(os.path.dirname(new_abs_path), exist_ok=True)
+        shutil.move(old_abs_path, new_abs_path)
+        self.update_references(sample, new_abs_path, new_rel_path, sample.size)
+    
+    def update_references(self, sample, new_abs_path, new_rel_path, size):
+        """Apunta todos los FileRef del archivo de un sample a una nueva ruta"""
+        old_name = sample.name
+        for ref in self.sample_index.move(sample.absolute_path, new_abs_path):
+            # Reescribir todas las rutas del FileRef (sin árbol se parchea al guardar)
+            if ref.file_ref is not None:
+                ref.file_ref.update(new_rel_path, new_abs_path, size)
+            
+            # Actualizar datos en memoria
+            ref.set_location(new_rel_path, new_abs_path)
+            ref.exists = True
+            ref.size = size
+            if ref.name != old_name:
+                self.duplicate_index.rename(ref, old_name)
+    
+    def rename_sample(self, sample, new_name):
+        """Renombra el archivo de un sample dentro de su carpeta"""
+        self.relocate_sample_file(sample, os.path.join(os.path.dirname(sample.absolute_path), new_name),
+                                  to_als_path(os.path.join(os.path.dirname(sample.relative_path), new_name)))
+    
+    def move_sample(self, sample, target_folder):
+        """Mueve el archivo de un sample a una carpeta relativa al proyecto"""
+        self.relocate_sample_file(sample, os.path.join(self.project_folder, target_folder, sample.name),
+                                  to_als_path(os.path.join(target_folder, sample.name)))
+    
+    def relink_sample(self, sample, new_abs_path, size):
+        """Apunta un sample faltante (y los FileRef que comparten su ruta) a un archivo existente"""
+        try:
+            new_rel_path = to_als_path(os.path.relpath(new_abs_path, self.project_folder))
+        except ValueError:
+            # En otra unidad (Windows) no hay ruta relativa posible
+            new_rel_path = to_als_path(new_abs_path)
+        self.update_references(sample, new_abs_path, new_rel_path, size)
+        # Otro archivo: sus metadatos se vuelven a leer
+        for ref in self.sample_index.get(new_abs_path):
+            ref.audio_info = None
+    
+    def read_audio_info(self, check_cancel=None, progress_callback=None):
+        """Lee los metadatos de audio de los samples existentes que aún no los tienen
+
+        Devuelve lo mismo que read_audio_infos; se asignan con set_audio_info
+        en el hilo que posee el proyecto.
+        """
+        paths = sorted({sample.absolute_path for sample in self.samples
+                        if sample.exists and sample.audio_info is None})
+        return read_audio_infos(paths, check_cancel, progress_callback)
+    
+    def set_audio_info(self, infos):
+        """Asigna a los samples los metadatos leídos con read_audio_info"""
+        for path, info in infos.items():
+            for sample in self.sample_index.get(path):
+                sample.audio_info = info
+    
+    def external_samples(self):
+        """Devuelve los samples existentes fuera de la carpeta del proyecto, uno por archivo"""
+        inside = os.path.join(path_key(self.project_folder), '')
+        external = {}
+        for sample in self.samples:
+            key = path_key(sample.absolute_path)
+            if sample.exists and not key.startswith(inside):
+                external.setdefault(key, sample)
+        return list(external.values())
+    
+    def collect_external_samples(self, check_cancel=None, progress_callback=None):
+        """Copia a COLLECT_FOLDER los samples que están fuera del proyecto
+
+        Solo copia archivos; las referencias se actualizan después con
+        relink_sample sobre las entradas devueltas, en el hilo que posee el
+        proyecto. Devuelve lo mismo que collect_files.
+        """
+        plan = plan_collect(self.external_samples(), self.project_folder)
+        return collect_files(plan, check_cancel, progress_callback)
+    
+    def find_unused_audio(self, check_cancel=None, progress_callback=None):
+        """Busca el audio de la carpeta del proyecto que no usa ningún .als ni preset
+
+        Una carpeta de proyecto de Live puede contener varios sets que comparten
+        samples, así que se suman las referencias de todos los .als de la
+        carpeta (salvo los de Backup) a las del proyecto en memoria, que
+        incluyen las ediciones sin guardar, y las de los presets guardados en
+        ella (Presets/). La carpeta se vuelve a recorrer para no partir de un
+        escaneo anterior a esas ediciones.
+        """
+        with ScanCache() as cache:
+            physical_files, _ = walk_project_folder(self.project_folder, check_cancel, cache)
+        
+        referenced = [sample.absolute_path for sample in self.samples]
+        projects = [self.als_path]
+        documents = find_als_files(self.project_folder, check_cancel, ('.als',) + PRESET_EXTENSIONS)
+        documents = [path for path in documents if batch_key(path) != batch_key(self.als_path)]
+        presets = []
+        for done, path in enumerate(documents, 1):
+            if check_cancel:
+                check_cancel()
+            # Un set o preset ilegible podría usar cualquier archivo: no hay informe fiable sin él
+            try:
+                if path.lower().endswith(PRESET_EXTENSIONS):
+                    referenced.extend(scan_preset_samples(path, self.project_folder))
+                    presets.append(path)
+                else:
+                    referenced.extend(scan_project_samples(path))
+                    projects.append(path)
+            except Exception as e:
+                raise OSError(f"No se pudo leer {path}: {str(e)}") from e
+            if progress_callback:
+                progress_callback(done, len(documents))
+        
+        return UnusedAudioReport(find_unused_audio(physical_files, referenced), projects, presets)
+    
+    def edited_samples(self):
+        """Devuelve los samples cuya ruta ha cambiado desde la carga o el último guardado"""
+        return [sample for sample in self.samples if sample.relative_path != sample.original_relative_path]
+    
+    def save(self, backup=True):
+        """Guarda las rutas editadas en el .als
+
+        Parchea solo los valores modificados cuando es posible y, si no, vuelve
+        a serializar el árbol completo. Devuelve 'patch', 'full' o None si no
+        había cambios.
+        """
+        edited = self.edited_samples()
+        if not edited:
+            return None
+        
+        if backup:
+            # Crear una copia de respaldo del archivo original
+            backup_file = f"{self.als_path}.backup"
+            shutil.copy2(self.als_path, backup_file)
+            logger.info(f"Creada copia de respaldo: {backup_file}")
+        
+        save_start = time.perf_counter()
+        mode = None
+        patches = collect_path_patches(edited)
+        if patches is not None:
+            # Parchear solo los RelativePath y Path modificados
+            try:
+                patch_als(self.als_path, patches)
+                mode = 'patch'
+            except PatchMismatch as e:
+                logger.warning(f"No se pudo parchear el proyecto, se guarda completo: {str(e)}")
+        
+        if mode is None:
+            # Guardar el XML modificado comprimiéndolo directamente al .als
+            self.ensure_xml_tree()
+            write_als(self.xml_tree, self.als_path)
+            mode = 'full'
+        logger.debug(f"Proyecto guardado ({mode}, {len(edited)} referencias) en "
+                     f"{time.perf_counter() - save_start:.2f} s")
+        
+        # El .als guardado pasa a ser la referencia de las próximas ediciones
+        for sample in edited:
+            sample.original_relative_path = sample.relative_path
+            if sample.original_path is not None:
+                sample.original_path = to_als_path(sample.absolute_path)
+            if sample.original_size is not None and sample.exists:
+                sample.original_size = sample.size
+        return mode
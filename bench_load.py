@@ -0,0 +1,59 @@
+"""Compara la latencia de carga de un proyecto .als.
+
+Mide el camino anterior (gzip en subproceso + XML temporal + ET.parse) frente
+a la descompresión en streaming de parse_als.
+
+Uso: python bench_load.py proyecto.als [repeticiones]
+"""
+import sys
+import os
+import subprocess
+import tempfile
+import shutil
+import time
+
+from lxml import etree as ET
+
+from asm_core import parse_als
+
+
+def load_with_subprocess(als_path):
+    """Carga el proyecto como lo hacía la versión anterior"""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        temp_xml = os.path.join(temp_dir, "temp_project.xml")
+        with open(temp_xml, 'wb') as f:
+            subprocess.run(['gzip', '-cd', als_path], stdout=f, check=True)
+        parser = ET.XMLParser(remove_blank_text=True)
+        return ET.parse(temp_xml, parser)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def measure(loader, als_path, repeats):
+    """Devuelve el mejor y el tiempo medio de carga en segundos"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        loader(als_path)
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    als_path = sys.argv[1]
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print(f"Proyecto: {als_path} ({os.path.getsize(als_path) / (1024 * 1024):.1f} MB comprimido)")
+    for label, loader in (("gzip + XML temporal", load_with_subprocess),
+                          ("streaming (parse_als)", parse_als)):
+        best, mean = measure(loader, als_path, repeats)
+        print(f"{label:<24} mejor: {best:.3f} s  media: {mean:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Pruebas de asm_core, sin interfaz gráfica
+
+Uso: python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asm_core
+from asm_core import (_etree, FileRefElements, FolderEntry, PhysicalFile, find_unused_audio,
+                      make_sample_entry, resolve_sample_files)
+
+# FileRef en el formato anterior a Live 11, con RelativePathElement numerados
+LEGACY_FILE_REF = """<FileRef>
+    <HasRelativePath Value="true" />
+    <RelativePathType Value="3" />
+    <RelativePath>
+        <RelativePathElement Id="0" Dir="Samples" />
+        <RelativePathElement Id="1" Dir="Recorded" />
+    </RelativePath>
+    <Name Value="kick.wav" />
+    <SearchHint>
+        <PathHint>
+            <RelativePathElement Id="0" Dir="Users" />
+            <RelativePathElement Id="1" Dir="me" />
+            <RelativePathElement Id="2" Dir="Proj" />
+            <RelativePathElement Id="3" Dir="Samples" />
+            <RelativePathElement Id="4" Dir="Recorded" />
+        </PathHint>
+        <FileSize Value="100" />
+    </SearchHint>
+</FileRef>"""
+
+def path_elements(parent):
+    return [(elem.get("Id"), elem.get("Dir")) for elem in parent.iterfind("RelativePathElement")]
+
+class FileRefElementsTest(unittest.TestCase):
+    def setUp(self):
+        parser = _etree().XMLParser(remove_blank_text=True)
+        self.refs = FileRefElements(_etree().fromstring(LEGACY_FILE_REF, parser))
+    
+    def test_update_keeps_ids_of_existing_elements(self):
+        self.refs.update("Samples/Drums/kick.wav", "/Users/me/Proj/Samples/Drums/kick.wav")
+        self.assertEqual(path_elements(self.refs.relative_path), [("0", "Samples"), ("1", "Drums")])
+        self.assertEqual(path_elements(self.refs.path_hint),
+                         [("0", "Users"), ("1", "me"), ("2", "Proj"), ("3", "Samples"), ("4", "Drums")])
+    
+    def test_update_numbers_new_elements(self):
+        self.refs.update("Samples/Drums/Kicks/kick.wav", "/Users/me/Proj/Samples/Drums/Kicks/kick.wav")
+        self.assertEqual(path_elements(self.refs.relative_path),
+                         [("0", "Samples"), ("1", "Drums"), ("2", "Kicks")])
+        self.assertEqual([elem_id for elem_id, _ in path_elements(self.refs.path_hint)],
+                         ["0", "1", "2", "3", "4", "5"])
+    
+    def test_update_removes_extra_elements(self):
+        self.refs.update("kick.wav", "/Users/me/Proj/kick.wav")
+        self.assertEqual(path_elements(self.refs.relative_path), [])
+        self.assertEqual(path_elements(self.refs.path_hint), [("0", "Users"), ("1", "me"), ("2", "Proj")])
+        self.assertEqual(self.refs.name.get("Value"), "kick.wav")
+
+class FindUnusedAudioTest(unittest.TestCase):
+    def setUp(self):
+        self.case_insensitive = asm_core.CASE_INSENSITIVE_FS
+        folder = FolderEntry("/proj/Samples", "Samples", "")
+        self.files = [PhysicalFile(folder, "kick.wav", 10), PhysicalFile(folder, "orphan.wav", 20)]
+    
+    def tearDown(self):
+        asm_core.CASE_INSENSITIVE_FS = self.case_insensitive
+    
+    def test_case_only_mismatch_is_used_on_case_insensitive_fs(self):
+        asm_core.CASE_INSENSITIVE_FS = True
+        unused = find_unused_audio(self.files, ["/proj/Samples/Kick.WAV"])
+        self.assertEqual([f.name for f in unused], ["orphan.wav"])
+    
+    def test_case_is_significant_on_case_sensitive_fs(self):
+        asm_core.CASE_INSENSITIVE_FS = False
+        unused = find_unused_audio(self.files, ["/proj/Samples/Kick.WAV"])
+        self.assertEqual([f.name for f in unused], ["kick.wav", "orphan.wav"])
+
+class ResolveSampleFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.case_insensitive = asm_core.CASE_INSENSITIVE_FS
+    
+    def tearDown(self):
+        asm_core.CASE_INSENSITIVE_FS = self.case_insensitive
+    
+    def test_case_only_mismatch_exists_on_case_insensitive_fs(self):
+        asm_core.CASE_INSENSITIVE_FS = True
+        folder = FolderEntry("/proj/Samples", "Samples", "")
+        samples = [make_sample_entry("/proj", "Samples/Kick.wav"), make_sample_entry("/proj", "Samples/gone.wav")]
+        resolve_sample_files(samples, [PhysicalFile(folder, "kick.wav", 10)], {"Samples": folder})
+        self.assertEqual([(s.exists, s.size) for s in samples], [(True, 10), (False, 0)])
+
+if __name__ == "__main__":
+    unittest.main()